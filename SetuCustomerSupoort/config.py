@@ -18,6 +18,7 @@ CHROMA_DIR.mkdir(exist_ok=True)
 # File paths
 DB_PATH = str(DATA_DIR / "secrets.db")
 KEY_PATH = str(DATA_DIR / "secret.key")
+FEEDBACK_DB_PATH = str(DATA_DIR / "feedback.db")
 
 # Ensure the Confluence configuration is set correctly
 CONFLUENCE_CONFIG = {}
@@ -1,16 +1,18 @@
-import clear
 import gradio as gr
 import json
+import orjson
 import requests
+import httpx
 import os
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Dict, List, Any, Optional
 import pandas as pd
 from datetime import datetime
 from openai import OpenAI
 from services.secret_store import retrieve_secret, store_secret  # Import the secret retrieval and storage functions
 import time
-from pathlib import Path
-import config  # Add this import
 
 # Disable all external connections and analytics
 os.environ["GRADIO_ANALYTICS_ENABLED"] = "False"
@@ -22,7 +24,8 @@ os.environ["GRADIO_TEMP_DIR"] = "./gradio_temp"
 GRADIO_STATIC = os.path.join(os.path.dirname(__file__), "setu-docs-frontend/src/static")
 os.makedirs(GRADIO_STATIC, exist_ok=True)
 
-# Load product configuration
+# Load product configuration (cached; call load_products.cache_clear() to reload)
+@lru_cache(maxsize=1)
 def load_products() -> List[str]:
     try:
         with open('config/product_docs.json', 'r') as f:
@@ -35,6 +38,27 @@ def load_products() -> List[str]:
 # API Configuration
 API_BASE_URL = "http://localhost:8000"
 
+# Large ID/URL lists are split into chunks of this size and posted concurrently
+BATCH_SIZE = 100
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Shared HTTP session and worker pool so batched POSTs reuse pooled connections
+http_session = requests.Session()
+batch_executor = ThreadPoolExecutor(max_workers=4)
+
+# One long-lived connection pool shared by every OpenAI client, so chat turns
+# reuse open TLS connections to api.openai.com even across key changes
+_OPENAI_HTTPX = httpx.Client(
+    limits=httpx.Limits(max_keepalive_connections=10, max_connections=20),
+    timeout=30.0
+)
+
+@lru_cache(maxsize=4)
+def make_openai_client(api_key: str) -> OpenAI:
+    """Build (once per key) an OpenAI client on the shared connection pool"""
+    return OpenAI(api_key=api_key, http_client=_OPENAI_HTTPX)
+
 # Replace the OpenAI client initialization
 def get_openai_client() -> Optional[OpenAI]:
     """Get OpenAI client with API key from secure storage"""
@@ -42,19 +66,19 @@ def get_openai_client() -> Optional[OpenAI]:
         # First try to get from secure storage
         api_key = retrieve_secret("openai_api_key")
         if api_key:
-            return OpenAI(api_key=api_key)
+            return make_openai_client(api_key)
         
         # Try FastAPI backend as fallback
         response = requests.get(f"{API_BASE_URL}/openai/api-key")
         if response.status_code == 200:
             api_key = response.json().get("api_key")
             if api_key:
-                return OpenAI(api_key=api_key)
+                return make_openai_client(api_key)
         
         # Try local config as last resort
         api_key = config_manager.get_config_value("openai_api_key")
         if api_key:
-            return OpenAI(api_key=api_key)
+            return make_openai_client(api_key)
             
         print("Warning: OpenAI API key not found in any storage")
         return None
@@ -67,10 +91,19 @@ SYSTEM_MESSAGE = """You are an AI assistant helping with Setu's documentation.
 Your role is to provide accurate, clear answers based on the available documentation.
 Always be professional and concise in your responses."""
 
+# Chat model settings; the model is configurable from the Configuration tab
+CHAT_MODELS = ["gpt-4o-mini", "gpt-4o", "gpt-4-turbo-preview"]
+DEFAULT_CHAT_MODEL = "gpt-4o-mini"
+LONG_CONTEXT_CHARS = 4000  # Contexts longer than this get a larger answer budget
+SHORT_ANSWER_TOKENS = 256
+LONG_ANSWER_TOKENS = 768
+
 class ConfigManager:
     def __init__(self):
         self.config_file = "config/app_config.json"
+        self._dirty = False
         self.load_config()
+        atexit.register(self.flush)
 
     def load_config(self):
         try:
@@ -97,15 +130,33 @@ class ConfigManager:
     def save_config(self):
         try:
             os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
-            with open(self.config_file, 'w') as f:
+            # Write to a temp file and swap it in so readers never see a partial file
+            tmp_file = f"{self.config_file}.tmp"
+            with open(tmp_file, 'w') as f:
                 json.dump(self.config, f, indent=4)
+            os.replace(tmp_file, self.config_file)
+            self._dirty = False
         except Exception as e:
             print(f"Error saving config: {e}")
 
+    def flush(self):
+        """Write pending config changes to disk, if any"""
+        if self._dirty:
+            self.save_config()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
     def update_config(self, key: str, value: str) -> str:
+        """Update a config value in memory; call flush() to persist"""
         try:
+            if self.config.get(key) == value:
+                return f"✅ {key} unchanged"
             self.config[key] = value
-            self.save_config()
+            self._dirty = True
             return f"✅ Updated {key}"
         except Exception as e:
             return f"❌ Error updating {key}: {e}"
@@ -128,7 +179,7 @@ def configure_api_key(api_key: str) -> str:
             return "❌ Error: API key cannot be empty"
             
         # Test the API key first
-        test_client = OpenAI(api_key=api_key)
+        test_client = make_openai_client(api_key)
         try:
             test_client.models.list()
         except Exception as e:
@@ -147,11 +198,12 @@ def configure_api_key(api_key: str) -> str:
             return f"⚠️ Warning: Failed to store in backend: {response.json().get('detail', 'Unknown error')}"
         
         # Update local config
-        config_manager.update_config("openai_api_key", api_key)
+        with config_manager:
+            config_manager.update_config("openai_api_key", api_key)
         
         # Update the client for the current session
         global client
-        client = OpenAI(api_key=api_key)
+        client = make_openai_client(api_key)
         
         return "✅ OpenAI API key configured successfully"
     except Exception as e:
@@ -168,24 +220,33 @@ def configure_confluence(url: str, username: str, api_token: str) -> str:
             }
         )
         if response.status_code == 200:
-            config_manager.update_config("confluence_url", url)
-            config_manager.update_config("confluence_username", username)
-            config_manager.update_config("confluence_api_token", api_token)
+            with config_manager:
+                config_manager.update_config("confluence_url", url)
+                config_manager.update_config("confluence_username", username)
+                config_manager.update_config("confluence_api_token", api_token)
             return "Confluence configured successfully"
         return f"Error: {response.json()['detail']}"
     except Exception as e:
         return f"Error: {str(e)}"
 
+def configure_chat_model(model: str) -> str:
+    """Select the OpenAI model used for chat completions"""
+    if not model:
+        return "❌ Error: Model cannot be empty"
+    with config_manager:
+        return config_manager.update_config("chat_model", model)
+
 def get_doc_context(product: str, question: str) -> str:
     """Get relevant document context for the question"""
     try:
         response = requests.post(
             f"{API_BASE_URL}/qa/context",
-            json={"product": product, "question": question},
+            data=orjson.dumps({"product": product, "question": question}),
+            headers=JSON_HEADERS,
             timeout=10
         )
         if response.ok:
-            return response.json().get("context", "")
+            return orjson.loads(response.content).get("context", "")
         return ""
     except Exception as e:
         print(f"Error getting context: {e}")
@@ -238,12 +299,15 @@ def chat_with_docs(
         # Add current message
         messages.append({"role": "user", "content": message})
 
+        # Size the answer budget to the amount of retrieved context
+        max_tokens = LONG_ANSWER_TOKENS if len(context) > LONG_CONTEXT_CHARS else SHORT_ANSWER_TOKENS
+
         # Get response from OpenAI
         response = client.chat.completions.create(
-            model="gpt-4-turbo-preview",
+            model=config_manager.get_config_value("chat_model", DEFAULT_CHAT_MODEL),
             messages=messages,
             temperature=0.7,
-            max_tokens=500
+            max_tokens=max_tokens
         )
 
         # Extract answer
@@ -299,7 +363,7 @@ def get_document_stats(product: str) -> pd.DataFrame:
     try:
         response = requests.get(f"{API_BASE_URL}/confluence/documents/{product}")
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             return pd.DataFrame([{
                 "Product": product,
                 "Document Count": data["document_count"],
@@ -309,15 +373,28 @@ def get_document_stats(product: str) -> pd.DataFrame:
         print(f"Error getting stats: {e}")
     return pd.DataFrame()
 
+def post_in_batches(endpoint: str, product: str, key: str, items: List[str]) -> List[Dict]:
+    """POST items to the backend, splitting large lists into concurrent batches"""
+    batches = [items[i:i + BATCH_SIZE] for i in range(0, len(items), BATCH_SIZE)]
+
+    def post_batch(batch: List[str]) -> Dict:
+        response = http_session.post(
+            f"{API_BASE_URL}{endpoint}",
+            data=orjson.dumps({"product": product, key: batch}),
+            headers=JSON_HEADERS
+        )
+        return orjson.loads(response.content)
+
+    if len(batches) == 1:
+        return [post_batch(batches[0])]
+    return list(batch_executor.map(post_batch, batches))
+
 def store_confluence_docs(product: str, doc_ids: str) -> str:
     """Store Confluence documents"""
     try:
         doc_ids = [id.strip() for id in doc_ids.split(",")]
-        response = requests.post(
-            f"{API_BASE_URL}/confluence/documents",
-            json={"product": product, "document_ids": doc_ids}
-        )
-        return response.json().get("message", "Error storing documents")
+        results = post_in_batches("/confluence/documents", product, "document_ids", doc_ids)
+        return "\n".join(result.get("message", "Error storing documents") for result in results)
     except Exception as e:
         return f"Error: {str(e)}"
 
@@ -325,11 +402,8 @@ def store_urls(product: str, urls: str) -> str:
     """Store URLs"""
     try:
         urls = [url.strip() for url in urls.split(",")]
-        response = requests.post(
-            f"{API_BASE_URL}/url/store",
-            json={"product": product, "urls": urls}
-        )
-        return response.json().get("message", "Error storing URLs")
+        results = post_in_batches("/url/store", product, "urls", urls)
+        return "\n".join(result.get("message", "Error storing URLs") for result in results)
     except Exception as e:
         return f"Error: {str(e)}"
 
@@ -345,7 +419,7 @@ def validate_product_selection(product: str) -> str:
         )
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             if data["document_count"] == 0:
                 return "⚠️ Warning: No documents found for this product. Please add documents first."
             return f"✅ {data['document_count']} documents available for {product}"
@@ -369,7 +443,7 @@ def get_all_product_stats() -> pd.DataFrame:
         for product in products:
             response = requests.get(f"{API_BASE_URL}/confluence/documents/{product}")
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 stats_data.append({
                     "Product": product,
                     "Document Count": data["document_count"],
@@ -473,13 +547,17 @@ with gr.Blocks(
     """
 ) as app:
     gr.Markdown("# Setu Documentation Assistant")
+
+    # Read the product list once and share it across every product dropdown
+    _products = load_products()
     
     with gr.Tabs():
         # Configuration Tab
-        with gr.Tab("Configuration"):
+        with gr.Tab("Configuration") as config_tab:
             gr.Markdown("### Current Configuration Status")
+            # Filled in when the tab is selected (or on Refresh) so page loads don't wait on the secret store
             status_table = gr.DataFrame(
-                value=get_config_status(),
+                value=pd.DataFrame(),
                 interactive=False
             )
             
@@ -506,7 +584,7 @@ with gr.Blocks(
             
             gr.Markdown("### API Key Status")
             api_key_status = gr.Textbox(
-                value=validate_api_key(),
+                value="",
                 label="API Key Status",
                 interactive=False
             )
@@ -514,13 +592,22 @@ with gr.Blocks(
             
             refresh_button = gr.Button("Refresh Status")
 
+            gr.Markdown("### Chat Model")
+            with gr.Row():
+                chat_model = gr.Dropdown(
+                    choices=CHAT_MODELS,
+                    value=config_manager.get_config_value("chat_model", DEFAULT_CHAT_MODEL),
+                    label="OpenAI Chat Model"
+                )
+                chat_model_output = gr.Textbox(label="Status")
+
         # Document Configuration Tab
         with gr.Tab("Document Configuration"):
             with gr.Row():
                 with gr.Column():
                     gr.Markdown("### Confluence Documents")
                     conf_product = gr.Dropdown(
-                        choices=load_products(),
+                        choices=_products,
                         label="Select Product"
                     )
                     conf_doc_ids = gr.Textbox(
@@ -534,7 +621,7 @@ with gr.Blocks(
                 with gr.Column():
                     gr.Markdown("### URL Documents")
                     url_product = gr.Dropdown(
-                        choices=load_products(),
+                        choices=_products,
                         label="Select Product"
                     )
                     urls_input = gr.Textbox(
@@ -548,7 +635,7 @@ with gr.Blocks(
             gr.Markdown("### Document Statistics")
             doc_stats = gr.DataFrame()
             stats_product = gr.Dropdown(
-                choices=load_products(),
+                choices=_products,
                 label="Select Product for Stats"
             )
             stats_button = gr.Button("Get Statistics")
@@ -560,7 +647,7 @@ with gr.Blocks(
             with gr.Row():
                 with gr.Column(scale=1):
                     chat_product = gr.Dropdown(
-                        choices=load_products(),
+                        choices=_products,
                         label="📚 Select Product",
                         interactive=True
                     )
@@ -613,6 +700,12 @@ with gr.Blocks(
         outputs=[confluence_output]
     )
     
+    chat_model.change(
+        configure_chat_model,
+        inputs=[chat_model],
+        outputs=[chat_model_output]
+    )
+
     validate_key_button.click(
         validate_api_key,
         outputs=[api_key_status]
@@ -641,17 +734,9 @@ with gr.Blocks(
         outputs=[doc_stats]
     )
     
-    msg.submit(
-        fn=chat_with_docs,
-        inputs=[msg, chatbot, chat_product, status_box],
-        outputs=[msg, chatbot, system_message]
-    ).then(
-        lambda: gr.update(value=""),
-        None,
-        [msg]
-    )
-
-    send_button.click(
+    # Enter and the send button share a single chat pipeline
+    gr.on(
+        triggers=[msg.submit, send_button.click],
         fn=chat_with_docs,
         inputs=[msg, chatbot, chat_product, status_box],
         outputs=[msg, chatbot, system_message]
@@ -663,11 +748,15 @@ with gr.Blocks(
     
 
 
-    refresh_products.click(
-        lambda: (
+    def reload_products():
+        load_products.cache_clear()
+        return (
             gr.update(choices=load_products()),
             "Products refreshed. Select a product to start chatting"
-        ),
+        )
+
+    refresh_products.click(
+        reload_products,
         outputs=[chat_product, system_message]
     )
 
@@ -680,7 +769,7 @@ with gr.Blocks(
     # Add at the top of your interface
     with gr.Row():
         server_status = gr.Textbox(
-            value=check_server_status(),
+            value="",
             label="Server Status",
             interactive=False
         )
@@ -692,6 +781,13 @@ with gr.Blocks(
         outputs=[server_status]
     )
 
+    # Server status is cheap, so fill it in once the page is visible. The config
+    # status and OpenAI key check only run when the Configuration tab is selected,
+    # so ordinary visitors don't each trigger a models.list() call.
+    app.load(check_server_status, outputs=[server_status])
+    config_tab.select(get_config_status, outputs=[status_table])
+    config_tab.select(validate_api_key, outputs=[api_key_status])
+
 if __name__ == "__main__":
     # Try to initialize OpenAI client
     client = get_openai_client()
@@ -700,6 +796,9 @@ if __name__ == "__main__":
     
     # Create temp directory if it doesn't exist
     os.makedirs("./gradio_temp", exist_ok=True)
+
+    # Let several chats wait on OpenAI concurrently instead of serializing them
+    app.queue(default_concurrency_limit=8, max_size=64)
     
     app.launch(
         # server_name="0.0.0.0",
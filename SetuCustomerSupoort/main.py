@@ -1,11 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import openai, qa, confluence, url, config, slack
+from fastapi.responses import ORJSONResponse
+from routers import openai, qa, confluence, url, config, slack, feedback
 from datetime import datetime
 import config as app_config
 from services.secret_store import retrieve_secret
+from services.feedback_store import feedback_writer
+from services.product_service import product_service
+from services.product_registry import product_registry
+from services.url_service import url_store
+import asyncio
+import logging
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Update CORS configuration
 app.add_middleware(
@@ -23,6 +32,49 @@ app.include_router(confluence.router)
 app.include_router(url.router)
 app.include_router(config.router)
 app.include_router(slack.router)
+app.include_router(feedback.router)
+
+@app.on_event("startup")
+async def start_feedback_writer():
+    app.state.feedback_task = asyncio.create_task(feedback_writer.run())
+
+@app.on_event("startup")
+async def load_product_registry():
+    found = await asyncio.to_thread(product_registry.refresh)
+    logger.info(f"Found documentation for {found} products")
+    app.state.product_registry_task = asyncio.create_task(product_registry.refresh_every())
+
+@app.on_event("startup")
+async def warm_vectorstore():
+    # Open each product's collection now so the first question doesn't pay for it
+    opened = await asyncio.to_thread(qa.vector_store.warm, product_service.get_all_products())
+    logger.info(f"Warmed {opened} product collections")
+
+@app.on_event("startup")
+async def warm_ingestion():
+    # Ingestion isn't needed to serve questions, so warm it without delaying startup
+    app.state.ingestion_warmup_task = asyncio.create_task(
+        asyncio.to_thread(url_store.warm, product_service.get_all_products())
+    )
+
+@app.on_event("shutdown")
+async def stop_feedback_writer():
+    app.state.feedback_task.cancel()
+    # Let the writer store the batch it was collecting before draining the queue
+    try:
+        await app.state.feedback_task
+    except asyncio.CancelledError:
+        pass
+    await feedback_writer.flush()
+
+@app.on_event("shutdown")
+async def stop_product_registry():
+    app.state.product_registry_task.cancel()
+
+@app.on_event("shutdown")
+async def close_slack_client():
+    await slack.flush_channel_configs()
+    await slack.close_slack_client()
 
 @app.get("/")
 async def root():
@@ -49,7 +101,7 @@ async def root():
 async def health_check():
     return {
         "status": "healthy",
-        "openai_key_configured": bool(app_config.OPENAI_API_KEY),
+        "openai_key_configured": bool(retrieve_secret("openai_api_key")),
         "database_initialized": True
     }
 
@@ -1,43 +1,72 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import config as app_config
 import os
 import json
+import asyncio
+import hashlib
+import aiofiles
+import orjson
 from services.product_service import product_service
+from services.product_registry import product_registry
 import logging
 
 router = APIRouter(prefix="/config", tags=["Configuration"])
 logger = logging.getLogger(__name__)
 
+PRODUCT_DOCS_FILE = 'product_docs.json'
+
+# Serializes product_docs.json rewrites without blocking the event loop
+_product_docs_lock = asyncio.Lock()
+
+async def write_product_docs(product_docs: Dict) -> None:
+    """Write product docs to disk asynchronously"""
+    async with _product_docs_lock:
+        async with aiofiles.open(PRODUCT_DOCS_FILE, 'w') as f:
+            await f.write(json.dumps(product_docs))
+
+# (product_service version, serialized product list, ETag) for the last response built;
+# the ETag hashes the body so it stays valid across restarts and workers
+_products_response: Optional[Tuple[int, bytes, str]] = None
+
 @router.get("/products")
-async def get_products() -> List[str]:
+async def get_products(request: Request) -> List[str]:
     """Get a list of all available products"""
+    global _products_response
     try:
-        # First try to get from product_service
-        products = product_service.get_all_products()
+        # First try to get from product_service; its list is versioned, so
+        # unchanged lists are answered with 304 or the already-encoded body
+        if product_service.products_set:
+            version = product_service.version
+            if not _products_response or _products_response[0] != version:
+                body = orjson.dumps(product_service.get_all_products())
+                etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+                _products_response = (version, body, etag)
+            _, body, etag = _products_response
+            if request.headers.get("if-none-match") == etag:
+                return Response(status_code=304, headers={"ETag": etag})
+            return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+        # Fallback to direct config
+        products = list(app_config.PRODUCT_DOCS.keys())
         
+        # If still empty, add default products
         if not products:
-            # Fallback to direct config
-            products = list(app_config.PRODUCT_DOCS.keys())
+            default_products = ["AA", "BOU", "COU", "UMAP", "Collect", "Bridge", "DG"]
+            logger.info(f"No products found, adding default products: {default_products}")
             
-            # If still empty, add default products
-            if not products:
-                default_products = ["AA", "BOU", "COU", "UMAP", "Collect", "Bridge", "DG"]
-                logger.info(f"No products found, adding default products: {default_products}")
-                
-                # Update product_docs.json
-                updated_product_docs = {product: [] for product in default_products}
-                try:
-                    with open('product_docs.json', 'w') as f:
-                        json.dump(updated_product_docs, f)
-                    # Update in-memory config
-                    app_config.PRODUCT_DOCS = updated_product_docs
-                    products = default_products
-                except Exception as e:
-                    logger.error(f"Error writing default products: {e}")
-                    raise HTTPException(status_code=500, detail=f"Error initializing products: {str(e)}")
-        
+            # Update product_docs.json
+            updated_product_docs = {product: [] for product in default_products}
+            try:
+                await write_product_docs(updated_product_docs)
+                # Update in-memory config
+                app_config.PRODUCT_DOCS = updated_product_docs
+                products = default_products
+            except Exception as e:
+                logger.error(f"Error writing default products: {e}")
+                raise HTTPException(status_code=500, detail=f"Error initializing products: {str(e)}")
+
         return products
         
     except Exception as e:
@@ -56,14 +85,14 @@ async def add_product(product: str) -> Dict:
         
         # Update product_docs.json
         try:
-            with open('product_docs.json', 'w') as f:
-                json.dump(app_config.PRODUCT_DOCS, f)
+            await write_product_docs(app_config.PRODUCT_DOCS)
         except Exception as e:
             logger.error(f"Error writing product_docs.json: {e}")
             raise HTTPException(status_code=500, detail=f"Error saving product: {str(e)}")
             
         # Create product directory in chroma_db if it doesn't exist
         os.makedirs(os.path.join("chroma_db", product), exist_ok=True)
+        product_registry.register(product)
             
         return {"message": f"Product '{product}' added successfully"}
         
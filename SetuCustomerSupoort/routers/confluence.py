@@ -1,17 +1,25 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from services.confluence_service import fetch_and_store_documents, doc_store
-from services.secret_store import secret_store, store_secret, retrieve_secret, reset_encryption
+from services.secret_store import secret_store, store_secret, reset_encryption
 from services.product_service import product_service
 import logging
 import os
+import time
+import asyncio
 from chromadb import PersistentClient, Collection
 from langchain_chroma import Chroma
 
 router = APIRouter(prefix="/confluence", tags=["Confluence"])
 logger = logging.getLogger(__name__)
 
+# Seconds a product's document count is served from cache
+COUNT_CACHE_TTL = 30
+
+# product -> (document count, time counted)
+_count_cache: Dict[str, Tuple[int, float]] = {}
+
 class ConfluenceConfig(BaseModel):
     url: str
     username: str
@@ -42,11 +50,11 @@ async def configure_confluence(config: ConfluenceConfig):
         store_secret("CONFLUENCE_API_TOKEN", config.api_token)
         
         # Verify storage
-        if not all([
-            retrieve_secret("CONFLUENCE_URL"),
-            retrieve_secret("CONFLUENCE_USERNAME"),
-            retrieve_secret("CONFLUENCE_API_TOKEN")
-        ]):
+        if not all(secret_store.get_many([
+            "CONFLUENCE_URL",
+            "CONFLUENCE_USERNAME",
+            "CONFLUENCE_API_TOKEN"
+        ]).values()):
             raise HTTPException(
                 status_code=500,
                 detail="Failed to verify stored credentials"
@@ -62,11 +70,12 @@ async def store_documents(request: DocumentRequest) -> Dict:
     """Store Confluence documents for a product"""
     try:
         # Validate product
-        if request.product not in product_service.get_all_products():
+        if request.product not in product_service.products_set:
             raise HTTPException(status_code=400, detail=f"Invalid product: {request.product}")
 
         # Store documents
         result = fetch_and_store_documents(request.product, request.document_ids)
+        _count_cache.pop(request.product, None)
         
         # Update product docs based on successful document processing
         if result["success"] or result.get("processing_stats", {}).get("total_processed", 0) > 0:
@@ -125,16 +134,21 @@ async def store_documents(request: DocumentRequest) -> Dict:
 async def get_document_stats(product: str) -> Dict:
     """Get document statistics for a product"""
     try:
-        vectorstore = doc_store.get_vectorstore(product)
-        if not vectorstore:
-            return {
-                "product": product,
-                "document_count": 0,
-                "status": "No documents found"
-            }
-            
-        collection = vectorstore._collection
-        count = collection.count()
+        cached = _count_cache.get(product)
+        if cached and time.monotonic() - cached[1] < COUNT_CACHE_TTL:
+            count = cached[0]
+        else:
+            # Chroma reads are blocking; keep them off the event loop
+            vectorstore = await asyncio.to_thread(doc_store.get_vectorstore, product)
+            if not vectorstore:
+                return {
+                    "product": product,
+                    "document_count": 0,
+                    "status": "No documents found"
+                }
+
+            count = await asyncio.to_thread(vectorstore._collection.count)
+            _count_cache[product] = (count, time.monotonic())
         
         return {
             "product": product,
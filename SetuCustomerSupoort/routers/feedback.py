@@ -1,16 +1,27 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from typing import List
 from models import FeedbackInput
-from datetime import datetime
+from services.feedback_store import feedback_store, feedback_writer
+import logging
+import time
 
 router = APIRouter(prefix="/feedback", tags=["Feedback"])
-
-feedback_store = {}
+logger = logging.getLogger(__name__)
 
 @router.post("")
-def submit_feedback(data: FeedbackInput):
-    feedback_store.setdefault(data.question, []).append({
-        "answer": data.answer,
-        "feedback": "👍" if data.thumbs_up else "👎",
-        "timestamp": datetime.now().isoformat()
-    })
-    return {"message": "Feedback recorded."}
\ No newline at end of file
+async def submit_feedback(data: FeedbackInput):
+    await feedback_writer.submit(data.question, data.answer, data.thumbs_up)
+    return {"message": "Feedback recorded."}
+
+@router.post("/batch")
+def submit_feedback_batch(data: List[FeedbackInput]):
+    """Record many feedback entries in one transaction"""
+    try:
+        now = time.time_ns()
+        count = feedback_store.add_feedback_batch(
+            [(item.question, item.answer, item.thumbs_up, now) for item in data]
+        )
+        return {"message": f"Recorded {count} feedback entries."}
+    except Exception as e:
+        logger.error(f"Error recording feedback batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
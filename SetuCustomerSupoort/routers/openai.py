@@ -1,14 +1,67 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Tuple
 from services.secret_store import store_secret, retrieve_secret
-from openai import OpenAI
+from openai import OpenAI, AuthenticationError
+import hashlib
+from collections import OrderedDict
+import time
 
 router = APIRouter(prefix="/openai", tags=["openai"])
 
 class APIKeyRequest(BaseModel):
     api_key: str
 
+# Seconds a key validation result is reused before asking OpenAI again, and how
+# many keys' results are kept (least recently checked are dropped first)
+KEY_VALIDATION_TTL = 300
+KEY_VALIDATION_CACHE_SIZE = 64
+
+# sha256(api_key) -> (error message or None if valid, time checked)
+_key_validation_cache: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
+
+# Process-wide OpenAI client, rebuilt only when the API key changes
+_client: Optional[OpenAI] = None
+_client_key_hash: Optional[str] = None
+
+def _key_fingerprint(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+def _get_client(api_key: str) -> OpenAI:
+    """Get the shared OpenAI client for an API key"""
+    global _client, _client_key_hash
+    key_hash = _key_fingerprint(api_key)
+    if _client is None or _client_key_hash != key_hash:
+        _client = OpenAI(api_key=api_key)
+        _client_key_hash = key_hash
+    return _client
+
+def _validate_openai_key(api_key: str) -> Optional[str]:
+    """Validate an API key against OpenAI, returning None if valid or the error message.
+
+    Valid keys and rejected keys are cached per key fingerprint for
+    KEY_VALIDATION_TTL seconds; other failures (timeouts, 5xx) are not cached.
+    """
+    fingerprint = _key_fingerprint(api_key)
+    cached = _key_validation_cache.pop(fingerprint, None)
+    if cached and time.monotonic() - cached[1] < KEY_VALIDATION_TTL:
+        _key_validation_cache[fingerprint] = cached
+        return cached[0]
+
+    try:
+        _get_client(api_key).models.list()
+        error = None
+    except AuthenticationError as e:
+        error = str(e)
+    except Exception as e:
+        # Transient failure: report it without remembering the key as invalid
+        return str(e)
+
+    _key_validation_cache[fingerprint] = (error, time.monotonic())
+    if len(_key_validation_cache) > KEY_VALIDATION_CACHE_SIZE:
+        _key_validation_cache.popitem(last=False)
+    return error
+
 @router.get("/api-key")
 async def get_api_key() -> dict:
     """Get OpenAI API key status"""
@@ -18,12 +71,10 @@ async def get_api_key() -> dict:
             return {"status": "not_configured", "message": "API key not found"}
         
         # Test the key
-        client = OpenAI(api_key=api_key)
-        try:
-            client.models.list()
+        error = _validate_openai_key(api_key)
+        if error is None:
             return {"status": "configured", "message": "API key is valid"}
-        except Exception as e:
-            return {"status": "invalid", "message": f"API key is invalid: {str(e)}"}
+        return {"status": "invalid", "message": f"API key is invalid: {error}"}
             
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -33,11 +84,9 @@ async def set_api_key(request: APIKeyRequest) -> dict:
     """Store OpenAI API key"""
     try:
         # Validate the API key
-        client = OpenAI(api_key=request.api_key)
-        try:
-            client.models.list()
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Invalid API key: {str(e)}")
+        error = _validate_openai_key(request.api_key)
+        if error is not None:
+            raise HTTPException(status_code=400, detail=f"Invalid API key: {error}")
         
         # Store the key
         store_secret("openai_api_key", request.api_key)
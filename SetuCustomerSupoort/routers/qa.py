@@ -1,37 +1,40 @@
-from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Request, Header
+from fastapi.responses import StreamingResponse, ORJSONResponse, Response
 from pydantic import BaseModel
-from typing import List, Optional, Dict, AsyncGenerator
+from typing import List, Optional, Dict, AsyncGenerator, Tuple
 from services.secret_store import retrieve_secret
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain_openai import ChatOpenAI
+from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_chroma import Chroma
-from langchain.memory import ConversationBufferMemory
+from langchain.memory import ConversationTokenBufferMemory
 from langchain.chains import ConversationalRetrievalChain
 from langchain.prompts import PromptTemplate
-from datetime import datetime
-import os
 import logging
-import json
 import asyncio
-from services.vectorstore import VectorStore
+import hashlib
+import orjson
+import re
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from services.vectorstore import vector_store
+from services.feedback_store import feedback_store, feedback_writer
+from services.semantic_cache import semantic_cache, SEMANTIC_CACHE_TTL
+from services.product_registry import product_registry
 
 router = APIRouter(prefix="/qa", tags=["QA"])
 logger = logging.getLogger(__name__)
 
-# Initialize the VectorStore service once for reuse
-vector_store = VectorStore()
-
 class QuestionRequest(BaseModel):
     product: str
     question: str
+    session_id: Optional[str] = None  # Set to keep chat history across questions
 
 class FeedbackRequest(BaseModel):
     question: str
     answer: str
     is_helpful: bool
 
-# Store feedback
-feedback_store: Dict[str, List[Dict]] = {}
 
 # Define the prompt template
 TROUBLESHOOT_PROMPT = PromptTemplate(
@@ -55,91 +58,176 @@ Answer:
 )
 
 def get_qa_chain(product: str):
-    """Initialize QA chain for a product"""
+    """Get the QA chain for a product, reusing a cached one when the API key is unchanged"""
     try:
         # Get OpenAI API key
         api_key = retrieve_secret("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OpenAI API key not configured")
 
-        # Initialize embeddings and LLM
-        embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-small",
-            openai_api_key=api_key
+        # Key the cache on a fingerprint so rotating the key builds a fresh chain
+        key_fingerprint = hashlib.sha256(api_key.encode()).hexdigest()
+        return _build_qa_chain(product, key_fingerprint)
+    except Exception as e:
+        logger.error(f"Error initializing QA chain: {e}")
+        raise
+
+# Chunks put in the prompt, chosen by MMR from the RETRIEVAL_FETCH_K nearest
+RETRIEVAL_K = 6
+RETRIEVAL_FETCH_K = 30
+
+def _log_cached_tokens(message) -> None:
+    """Log how much of the prompt OpenAI served from its prompt cache, when reported"""
+    usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+    if cached is not None:
+        logger.debug(f"Prompt cache: {cached} of {usage.get('prompt_tokens')} prompt tokens cached")
+
+def split_prompt_template(prompt_template: PromptTemplate) -> Tuple[str, PromptTemplate]:
+    """Split a product template into its fixed instructions and a template for the per-question part.
+
+    The instructions go in the system message unchanged for every request, so
+    they form a byte-stable prefix OpenAI can serve from its prompt cache.
+    """
+    template = prompt_template.template
+    start = template.find("{context}")
+    if start == -1:
+        return "", prompt_template
+    return template[:start].strip(), PromptTemplate(
+        input_variables=["context", "question"],
+        template=template[start:]
+    )
+
+class CustomConversationalChain:
+    """Retrieve product documents and answer with the LLM.
+
+    Instances are cached and shared between requests, so they hold no
+    per-conversation state; chat history lives in get_session_memory().
+    """
+    def __init__(self, llm, retriever, prompt_template, product):
+        self.llm = llm
+        self.retriever = retriever
+        self.prompt_template = prompt_template
+        self.system_prompt, self.question_template = split_prompt_template(prompt_template)
+        self.product = product
+
+    def _prepare(self, question: str, chat_history=()):
+        """Retrieve documents and build the chat messages for a question"""
+        # Get documents from retriever
+        docs = self.retriever(question, self.product, k=RETRIEVAL_K, fetch_k=RETRIEVAL_FETCH_K)
+
+        # Format context from documents
+        context = "\n\n".join([doc.page_content for doc in docs])
+
+        # Fixed instructions first, then the session's earlier turns, then the
+        # retrieved context and question
+        messages = [*chat_history, HumanMessage(content=self.question_template.format(
+            context=context,
+            question=question
+        ))]
+        if self.system_prompt:
+            messages.insert(0, SystemMessage(content=self.system_prompt))
+        return docs, messages
+
+    def invoke(self, inputs):
+        docs, messages = self._prepare(inputs["question"], inputs.get("chat_history", ()))
+
+        # Generate answer using LLM
+        answer = self.llm.invoke(messages).content
+
+        # Return answer and source documents
+        return {
+            "answer": answer,
+            "source_documents": docs
+        }
+
+    async def ainvoke(self, inputs):
+        """Like invoke, without blocking the event loop"""
+        # Retrieval embeds the query and searches Chroma; keep it off the event loop
+        docs, messages = await asyncio.to_thread(
+            self._prepare, inputs["question"], inputs.get("chat_history", ())
         )
-        llm = ChatOpenAI(
-            model_name="gpt-4-turbo-preview",
-            temperature=0.2,  # Reduced temperature for more factual responses
-            streaming=True,
-            openai_api_key=api_key
+        message = await self.llm.ainvoke(messages)
+        _log_cached_tokens(message)
+        return {
+            "answer": message.content,
+            "source_documents": docs
+        }
+
+    async def astream(self, inputs):
+        """Yield {"source_documents": docs} once, then {"answer": delta} as tokens arrive"""
+        docs, messages = await asyncio.to_thread(
+            self._prepare, inputs["question"], inputs.get("chat_history", ())
         )
+        yield {"source_documents": docs}
+
+        async for chunk in self.llm.astream(messages):
+            if chunk.content:
+                yield {"answer": chunk.content}
+
+@lru_cache(maxsize=4)
+def _llm(key_fingerprint: str) -> ChatOpenAI:
+    """Get the chat model client, shared by every product's chain for an API key"""
+    return ChatOpenAI(
+        model_name="gpt-4-turbo-preview",
+        temperature=0.2,  # Reduced temperature for more factual responses
+        streaming=True,
+        openai_api_key=retrieve_secret("OPENAI_API_KEY")
+    )
 
-        # Use the VectorStore already initialized at module level
-        # This will access all documents, including GitHub and Confluence
-        retriever = vector_store.search
-        
-        # Create memory
-        memory = ConversationBufferMemory(
+@lru_cache(maxsize=32)
+def _build_qa_chain(product: str, key_fingerprint: str) -> CustomConversationalChain:
+    """Build the QA chain for a product; cached per (product, API key fingerprint)"""
+    llm = _llm(key_fingerprint)
+
+    # Use the VectorStore already initialized at module level
+    # This will access all documents, including GitHub and Confluence
+    retriever = vector_store.search_mmr
+
+    # Create a product-specific prompt template
+    prompt_template = get_product_prompt_template(product)
+
+    logger.info(f"Built QA chain for product '{product}'")
+    return CustomConversationalChain(
+        llm=llm,
+        retriever=retriever,
+        prompt_template=prompt_template,
+        product=product
+    )
+
+# Chat history per client session, kept out of the shared chain cache. Each session
+# keeps at most SESSION_MEMORY_TOKENS of history; least recently used sessions are
+# dropped beyond SESSION_MEMORY_LIMIT.
+SESSION_MEMORY_TOKENS = 1500
+SESSION_MEMORY_LIMIT = 1000
+session_memories: "OrderedDict[str, ConversationTokenBufferMemory]" = OrderedDict()
+
+def get_session_memory(session_id: str, llm: ChatOpenAI) -> ConversationTokenBufferMemory:
+    """Get (or create) the conversation memory for a client session"""
+    memory = session_memories.get(session_id)
+    if memory is None:
+        memory = ConversationTokenBufferMemory(
+            llm=llm,  # Used to count tokens when trimming history
+            max_token_limit=SESSION_MEMORY_TOKENS,
             memory_key="chat_history",
             return_messages=True,
             output_key="answer"
         )
-        
-        # Create a product-specific prompt template
-        prompt_template = get_product_prompt_template(product)
-
-        # Custom implementation of ConversationalRetrievalChain to use our VectorStore
-        class CustomConversationalChain:
-            def __init__(self, llm, retriever, memory, prompt_template, product):
-                self.llm = llm
-                self.retriever = retriever
-                self.memory = memory
-                self.prompt_template = prompt_template
-                self.product = product
-                self.history = []
-                
-            def invoke(self, inputs):
-                question = inputs["question"]
-                
-                # Add to history
-                if "chat_history" in inputs:
-                    self.history = inputs["chat_history"]
-                
-                # Get documents from retriever
-                docs = self.retriever(question, self.product, k=15)
-                
-                # Format context from documents
-                context = "\n\n".join([doc.page_content for doc in docs])
-                
-                # Format prompt with context and question
-                formatted_prompt = self.prompt_template.format(
-                    context=context,
-                    question=question
-                )
-                
-                # Generate answer using LLM
-                answer = self.llm.predict(formatted_prompt)
-                
-                # Return answer and source documents
-                return {
-                    "answer": answer,
-                    "source_documents": docs
-                }
-
-        return CustomConversationalChain(
-            llm=llm,
-            retriever=retriever,
-            memory=memory,
-            prompt_template=prompt_template,
-            product=product
-        )
-    except Exception as e:
-        logger.error(f"Error initializing QA chain: {e}")
-        raise
+        session_memories[session_id] = memory
+        if len(session_memories) > SESSION_MEMORY_LIMIT:
+            session_memories.popitem(last=False)
+    else:
+        session_memories.move_to_end(session_id)
+    return memory
 
-def get_product_prompt_template(product: str) -> PromptTemplate:
-    """Get a product-specific prompt template"""
-    base_template = """
+def chain_inputs(question: str, memory: Optional[ConversationTokenBufferMemory]) -> Dict:
+    """Build the chain inputs for a question, with the session's chat history if it has one"""
+    if memory is None:
+        return {"question": question}
+    return {"question": question, "chat_history": memory.load_memory_variables({})["chat_history"]}
+
+# Default prompt; {product} is filled in once per product by get_product_prompt_template
+BASE_PROMPT_TEMPLATE = """
 You are a helpful human support assistant from Setu who specializes in {product}.
 Use the following reference information to answer the question:
 {context}
@@ -150,9 +238,11 @@ Question:
 
 """
 
-    # Product-specific templates
-    if product == "UMAP":
-        template = """
+# Prompt templates by product, built once; other products are added on first use
+_PROMPTS: Dict[str, PromptTemplate] = {
+    "UMAP": PromptTemplate(
+        input_variables=["context", "question"],
+        template="""
 You are a helpful human support assistant at Setu who specializes in UPI Setu (UMAP) integration.
 
 
@@ -165,8 +255,10 @@ Question:
 
 Your helpful human response:
 """
-    elif product == "ACCOUNT_AGGREGATOR":
-        template = """
+    ),
+    "ACCOUNT_AGGREGATOR": PromptTemplate(
+        input_variables=["context", "question"],
+        template="""
 You are a helpful human support assistant at Setu who specializes in Account Aggregator.
 
 
@@ -179,27 +271,189 @@ Question:
 
 Your helpful human response:
 """
-    else:
-        template = base_template.replace("{product}", product)
+    ),
+}
 
-    return PromptTemplate(
-        input_variables=["context", "question"],
-        template=template
-    )
+def get_product_prompt_template(product: str) -> PromptTemplate:
+    """Get a product-specific prompt template"""
+    prompt = _PROMPTS.get(product)
+    if prompt is None:
+        prompt = _PROMPTS.setdefault(product, PromptTemplate(
+            input_variables=["context", "question"],
+            template=BASE_PROMPT_TEMPLATE.replace("{product}", product)
+        ))
+    return prompt
+
+def format_sources(docs, product: str) -> List[Dict]:
+    """Build the source list returned to clients, skipping docs with no title or URL"""
+    out = []
+    for doc in docs:
+        m = doc.metadata
+        url = m.get("url", "")
+        if not (m.get("title") or url):
+            continue
+        out.append({
+            "title": m.get("title", "Unknown"),
+            "page_id": m.get("page_id", "Unknown"),
+            "type": m.get("type", "URL" if url else "Unknown"),
+            "product": m.get("product", product),
+            "url": url  # Include URL for web sources
+        })
+    return out
+
+# Serialized answer/sources per (product, question), kept as JSON with the closing
+# brace removed so live feedback can be appended without re-encoding the answer.
+# semantic_cache maps similar questions onto these keys. Entries expire with the
+# semantic cache and are dropped once their product is ingested again.
+ANSWER_CACHE_SIZE = 512
+ANSWER_CACHE_TTL = SEMANTIC_CACHE_TTL
+# (product, question) -> (body, time stored, product_registry generation when stored)
+_answer_cache: "OrderedDict[tuple, Tuple[bytes, float, int]]" = OrderedDict()
+
+def _cache_answer(key: tuple, answer: str, sources: List[Dict]) -> bytes:
+    body = orjson.dumps({"answer": answer, "sources": sources})[:-1]
+    _answer_cache[key] = (body, time.monotonic(), product_registry.generation(key[0]))
+    _answer_cache.move_to_end(key)
+    if len(_answer_cache) > ANSWER_CACHE_SIZE:
+        _answer_cache.popitem(last=False)
+    product, question = key
+    semantic_cache.store(product, vector_store.embed_query(question), key)
+    return body
+
+def _find_cached_answer(product: str, question: str) -> Optional[tuple]:
+    """Get the answer cache key for this question, or for a semantically similar one"""
+    key = (product, question)
+    if key not in _answer_cache:
+        key = semantic_cache.check(product, vector_store.embed_query(question))
+        if key is None or key not in _answer_cache:
+            return None
+    _, stored_at, generation = _answer_cache[key]
+    if time.monotonic() - stored_at > ANSWER_CACHE_TTL or generation != product_registry.generation(product):
+        del _answer_cache[key]
+        return None
+    _answer_cache.move_to_end(key)
+    return key
+
+def _load_cached_answer(key: tuple) -> Dict:
+    """Decode a cached answer back into {"answer": ..., "sources": [...]}"""
+    return orjson.loads(_answer_cache[key][0] + b"}")
+
+def _answer_response(body: bytes, prior_feedbacks: List[Dict]) -> Response:
+    content = body + b',"previous_feedback":' + orjson.dumps(prior_feedbacks) + b'}'
+    return Response(content=content, media_type="application/json")
+
+# Greetings and small talk are answered directly, without retrieval or an LLM call
+_GREETINGS = {"hi", "hello", "hey", "hi there", "hello there", "hey there",
+              "good morning", "good afternoon", "good evening"}
+_THANKS = {"thanks", "thank you", "thanks a lot", "thank you so much", "thx", "ty",
+           "ok thanks", "okay thanks", "great thanks", "cool thanks"}
+_IDENTITY = {"who are you", "what are you", "what can you do", "what do you do"}
+_NON_WORD = re.compile(r"[^a-z ]+")
+
+def small_talk_reply(question: str, product: str) -> Optional[str]:
+    """Return a canned reply if the question is only a greeting, thanks or 'who are you'"""
+    text = " ".join(_NON_WORD.sub(" ", question.lower()).split())
+    if text in _GREETINGS:
+        return f"Hello! I'm Setu's support assistant for {product}. What would you like to know?"
+    if text in _THANKS:
+        return "You're welcome! Let me know if there's anything else I can help with."
+    if text in _IDENTITY:
+        return (f"I'm Setu's support assistant. I answer questions about {product} "
+                f"using Setu's documentation. Ask me about an integration, API or error you're seeing.")
+    return None
+
+async def stream_answer(request: QuestionRequest, conversation_chain, memory) -> AsyncGenerator[bytes, None]:
+    """Stream an answer as NDJSON: {"delta": ...} lines, then one sources/feedback trailer"""
+    sources = []
+    answer_parts = []
+    try:
+        cacheable = memory is None or not memory.chat_memory.messages
+        cache_key = _find_cached_answer(request.product, request.question) if cacheable else None
+        if cache_key is not None:
+            logger.info(f"Streaming cached answer for product '{request.product}': {request.question}")
+            cached = _load_cached_answer(cache_key)
+            yield orjson.dumps({"delta": cached["answer"]}) + b"\n"
+            yield orjson.dumps({
+                "sources": cached["sources"],
+                "previous_feedback": await asyncio.to_thread(feedback_store.get_feedback, cache_key[1], limit=3)
+            }) + b"\n"
+            return
+
+        async for chunk in conversation_chain.astream(chain_inputs(request.question, memory)):
+            if "source_documents" in chunk:
+                sources = chunk["source_documents"]
+                continue
+            answer_parts.append(chunk["answer"])
+            yield orjson.dumps({"delta": chunk["answer"]}) + b"\n"
+
+        answer = "".join(answer_parts)
+        if memory is not None:
+            memory.save_context(
+                {"question": request.question},
+                {"answer": answer}
+            )
+
+        source_titles = format_sources(sources, request.product)
+        if cacheable:
+            _cache_answer((request.product, request.question), answer, source_titles)
+        yield orjson.dumps({
+            "sources": source_titles,
+            "previous_feedback": await asyncio.to_thread(feedback_store.get_feedback, request.question, limit=3)
+        }) + b"\n"
+    except Exception as e:
+        logger.error(f"Error streaming answer: {e}")
+        yield orjson.dumps({"error": str(e)}) + b"\n"
 
 @router.post("/ask")
-async def ask_question(request: QuestionRequest):
-    """Ask a question about a product's documentation"""
+async def ask_question(request: QuestionRequest, stream: bool = False,
+                       x_session_id: Optional[str] = Header(None)):
+    """Ask a question about a product's documentation.
+
+    With ?stream=true the answer is streamed as NDJSON as the LLM generates it.
+    The chat session can be given as session_id in the body or an X-Session-Id header.
+    """
     try:
         # Check if the product exists
-        product_dir = os.path.join("chroma_db", request.product)
-        if not os.path.exists(product_dir):
+        if not product_registry.has_product(request.product):
             return {
                 "answer": f"No documentation found for product '{request.product}'. Please check the product name or add documentation first.",
                 "sources": [],
                 "previous_feedback": []
             }
+
+        reply = small_talk_reply(request.question, request.product)
+        if reply is not None:
+            if stream:
+                async def small_talk_stream() -> AsyncGenerator[bytes, None]:
+                    yield orjson.dumps({"delta": reply}) + b"\n"
+                    yield orjson.dumps({"sources": [], "previous_feedback": []}) + b"\n"
+                return StreamingResponse(small_talk_stream(), media_type="application/x-ndjson")
+            return {"answer": reply, "sources": [], "previous_feedback": []}
             
+        # Embed the question in a worker thread; cache lookups and retrieval reuse the vector
+        await asyncio.to_thread(vector_store.embed_query, request.question)
+
+        # Answers only depend on the question unless the session has history
+        session_id = request.session_id or x_session_id
+        memory = get_session_memory(session_id, get_qa_chain(request.product).llm) if session_id else None
+
+        if stream:
+            logger.info(f"Streaming answer for product '{request.product}': {request.question}")
+            return StreamingResponse(
+                stream_answer(request, get_qa_chain(request.product), memory),
+                media_type="application/x-ndjson"
+            )
+
+        cacheable = memory is None or not memory.chat_memory.messages
+        cached_key = _find_cached_answer(request.product, request.question) if cacheable else None
+        if cached_key is not None:
+            logger.info(f"Serving cached answer for product '{request.product}': {request.question}")
+            # Take the body now; the entry could be evicted while feedback is read
+            body = _answer_cache[cached_key][0]
+            # Feedback follows the question the cached answer was generated for
+            prior_feedbacks = await asyncio.to_thread(feedback_store.get_feedback, cached_key[1], limit=3)
+            return _answer_response(body, prior_feedbacks)
+
         # Get QA chain for the product
         conversation_chain = get_qa_chain(request.product)
 
@@ -207,46 +461,35 @@ async def ask_question(request: QuestionRequest):
         logger.info(f"Processing question for product '{request.product}': {request.question}")
 
         # Get answer
-        result = conversation_chain.invoke({
-            "question": request.question
-        })
+        result = await conversation_chain.ainvoke(chain_inputs(request.question, memory))
 
         # Extract answer and sources
         answer = result["answer"]
         sources = result.get("source_documents", [])
+
+        if memory is not None:
+            memory.save_context(
+                {"question": request.question},
+                {"answer": answer}
+            )
         
-        # Log source count for debugging
+        # Log source count for debugging; retrieval only returns this product's chunks
         logger.info(f"Found {len(sources)} sources for product '{request.product}'")
         
-        # Verify that sources are from the requested product
-        valid_sources = []
-        for doc in sources:
-            doc_product = doc.metadata.get("product", "")
-            if doc_product == request.product or not doc_product:  # Allow docs without product tag if from product-specific collection
-                valid_sources.append(doc)
-        
-        # Log the number of valid sources
-        logger.info(f"After filtering, {len(valid_sources)} valid sources remain")
-        
-        source_titles = [
-            {
-                "title": doc.metadata.get("title", "Unknown"),
-                "page_id": doc.metadata.get("page_id", "Unknown"),
-                "type": doc.metadata.get("type", "URL" if doc.metadata.get("url") else "Unknown"),
-                "product": doc.metadata.get("product", request.product),
-                "url": doc.metadata.get("url", "")  # Include URL for web sources
-            }
-            for doc in valid_sources if doc.metadata.get("title") or doc.metadata.get("url")
-        ]
+        source_titles = format_sources(sources, request.product)
 
         # Get previous feedback
-        prior_feedbacks = feedback_store.get(request.question, [])
+        prior_feedbacks = await asyncio.to_thread(feedback_store.get_feedback, request.question, limit=3)
 
-        return {
+        if cacheable:
+            body = _cache_answer((request.product, request.question), answer, source_titles)
+            return _answer_response(body, prior_feedbacks)
+
+        return ORJSONResponse({
             "answer": answer,
             "sources": source_titles,
-            "previous_feedback": prior_feedbacks[-3:] if prior_feedbacks else []
-        }
+            "previous_feedback": prior_feedbacks
+        })
 
     except Exception as e:
         logger.error(f"Error processing question: {e}")
@@ -256,22 +499,18 @@ async def ask_question(request: QuestionRequest):
 async def submit_feedback(request: FeedbackRequest):
     """Submit feedback for an answer"""
     try:
-        feedback_store.setdefault(request.question, []).append({
-            "answer": request.answer,
-            "feedback": "👍" if request.is_helpful else "👎",
-            "timestamp": datetime.now().isoformat()
-        })
+        await feedback_writer.submit(request.question, request.answer, request.is_helpful)
         return {"message": "Feedback submitted successfully"}
     except Exception as e:
         logger.error(f"Error submitting feedback: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/feedback/{question}")
-async def get_feedback(question: str):
-    """Get feedback history for a question"""
+def get_feedback(question: str):
+    """Get feedback history for a question; a plain def, so FastAPI runs the SQLite read in its threadpool"""
     return {
         "question": question,
-        "feedback_history": feedback_store.get(question, [])
+        "feedback_history": feedback_store.get_feedback(question)
     }
 
 @router.post("/ask/stream")
@@ -279,8 +518,7 @@ async def ask_question_stream(request: QuestionRequest):
     """Ask a question about a product's documentation with streaming response"""
     try:
         # Check if the product exists
-        product_dir = os.path.join("chroma_db", request.product)
-        if not os.path.exists(product_dir):
+        if not product_registry.has_product(request.product):
             # Create an error generator instead of trying to return from inside yield
             async def error_generator():
                 error_message = (f"No documentation found for product '{request.product}'. "
@@ -289,7 +527,27 @@ async def ask_question_stream(request: QuestionRequest):
                 yield f'\n\n{{"sources": []}}'
                 
             return StreamingResponse(error_generator(), media_type="text/plain")
-            
+
+        reply = small_talk_reply(request.question, request.product)
+        if reply is not None:
+            async def small_talk_stream() -> AsyncGenerator[str, None]:
+                yield reply
+                yield '\n\n{"sources": []}'
+            return StreamingResponse(small_talk_stream(), media_type="text/plain")
+
+        # Embed the question in a worker thread; cache lookups and retrieval reuse the vector
+        await asyncio.to_thread(vector_store.embed_query, request.question)
+        cache_key = _find_cached_answer(request.product, request.question)
+        if cache_key is not None:
+            cached = _load_cached_answer(cache_key)
+
+            async def cached_stream() -> AsyncGenerator[str, None]:
+                yield cached["answer"]
+                yield f'\n\n{{"sources": {orjson.dumps(cached["sources"]).decode()}}}'
+
+            logger.info(f"Streaming cached answer for product '{request.product}': {request.question}")
+            return StreamingResponse(cached_stream(), media_type="text/plain")
+
         # Get QA chain for the product
         conversation_chain = get_qa_chain(request.product)
 
@@ -298,34 +556,24 @@ async def ask_question_stream(request: QuestionRequest):
         
         async def generate_stream() -> AsyncGenerator[str, None]:
             try:
-                # Get result but not streaming part yet
-                result = conversation_chain.invoke({
-                    "question": request.question
-                })
-                
-                # Extract answer and process
-                answer = result["answer"]
-                
-                # Yield the answer for streaming
-                yield answer
+                sources = []
+                answer_parts = []
+
+                # Yield answer tokens as the LLM generates them
+                async for chunk in conversation_chain.astream({"question": request.question}):
+                    if "source_documents" in chunk:
+                        sources = chunk["source_documents"]
+                        continue
+                    answer_parts.append(chunk["answer"])
+                    yield chunk["answer"]
                 
                 # After streaming the content, send the sources as JSON
-                sources = result.get("source_documents", [])
-                
                 # Format the sources as needed
-                source_titles = [
-                    {
-                        "title": doc.metadata.get("title", "Unknown"),
-                        "page_id": doc.metadata.get("page_id", "Unknown"),
-                        "type": doc.metadata.get("type", "URL" if doc.metadata.get("url") else "Unknown"),
-                        "product": doc.metadata.get("product", request.product),
-                        "url": doc.metadata.get("url", "")
-                    }
-                    for doc in sources if doc.metadata.get("title") or doc.metadata.get("url")
-                ]
+                source_titles = format_sources(sources, request.product)
+                _cache_answer((request.product, request.question), "".join(answer_parts), source_titles)
                 
                 # Yield the sources as JSON
-                yield f'\n\n{{"sources": {json.dumps(source_titles)}}}'
+                yield f'\n\n{{"sources": {orjson.dumps(source_titles).decode()}}}'
                 
             except Exception as e:
                 logger.error(f"Error in stream generation: {e}")
@@ -1,21 +1,27 @@
 from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+from fastapi.responses import StreamingResponse, Response
+from pydantic import BaseModel, TypeAdapter
+from typing import AsyncIterator, Iterator, List, Dict, Optional, Set
 import logging
 import logging.handlers
 import os
-import json
+import orjson
+import aiofiles
+import aiofiles.os
 from services.secret_store import store_secret, retrieve_secret
 from services.url_service import url_store
 from services.product_service import product_service
 from langchain_core.documents import Document
 from datetime import datetime
-from slack_sdk import WebClient
+from slack_sdk.web.async_client import AsyncWebClient
 from slack_sdk.errors import SlackApiError
+import aiohttp
 import time
 import random
 import asyncio
 import functools
+from pathlib import Path
+from collections import OrderedDict
 
 router = APIRouter(prefix="/slack", tags=["Slack"])
 
@@ -53,94 +59,135 @@ class SlackChannelConfig(BaseModel):
     max_messages: int = 1000
     description: Optional[str] = None
 
+class SlackChannelSettings(BaseModel):
+    """A configured channel as stored in the channel config file"""
+    product: str
+    include_threads: bool = True
+    max_messages: int = 1000
+    channel_name: Optional[str] = None
+    description: Optional[str] = None
+    last_processed: Optional[str] = None
+
+# Decodes and validates the whole config file straight into SlackChannelSettings
+_channel_configs_adapter = TypeAdapter(Dict[str, SlackChannelSettings])
+
+# Maximum Slack API calls in flight at once when fetching threads or channel info
+SLACK_CONCURRENCY = 8
+
 # Path to store slack channel configurations
-SLACK_CONFIG_PATH = "config/slack_channels.json"
-os.makedirs(os.path.dirname(SLACK_CONFIG_PATH), exist_ok=True)
+SLACK_CONFIG_PATH = Path("config/slack_channels.json")
+SLACK_CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-def load_channel_configs() -> Dict:
-    """Load slack channel configurations from file"""
-    if not os.path.exists(SLACK_CONFIG_PATH):
-        return {}
+# Parsed channel configs with the file mtime they were read at
+_configs_cache: Optional[tuple] = None
+_configs_lock = asyncio.Lock()
+
+async def load_channel_configs() -> Dict[str, SlackChannelSettings]:
+    """Load slack channel configurations, re-reading the file only when it has changed"""
+    global _configs_cache
     try:
-        with open(SLACK_CONFIG_PATH, 'r') as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"Error loading slack configs: {e}")
+        mtime = (await aiofiles.os.stat(SLACK_CONFIG_PATH)).st_mtime_ns
+    except FileNotFoundError:
         return {}
+    async with _configs_lock:
+        if _configs_cache is not None and _configs_cache[0] == mtime:
+            return _configs_cache[1]
+        try:
+            async with aiofiles.open(SLACK_CONFIG_PATH, 'rb') as f:
+                configs = _channel_configs_adapter.validate_json(await f.read())
+        except Exception as e:
+            logger.error(f"Error loading slack configs: {e}")
+            return {}
+        _configs_cache = (mtime, configs)
+        return configs
 
-def save_channel_configs(configs: Dict) -> bool:
+async def write_file_atomic(path: Path, data: bytes):
+    """Write a file through a temporary file and a rename, so a crash never leaves it half-written"""
+    tmp_path = path.with_suffix(".tmp")
+    async with aiofiles.open(tmp_path, 'wb') as f:
+        await f.write(data)
+    await aiofiles.os.replace(tmp_path, path)
+
+async def save_channel_configs(configs: Dict[str, SlackChannelSettings]) -> bool:
     """Save slack channel configurations to file"""
-    try:
-        with open(SLACK_CONFIG_PATH, 'w') as f:
-            json.dump(configs, f, indent=2)
-        return True
-    except Exception as e:
-        logger.error(f"Error saving slack configs: {e}")
-        return False
+    global _configs_cache
+    async with _configs_lock:
+        try:
+            await write_file_atomic(SLACK_CONFIG_PATH, _channel_configs_adapter.dump_json(configs, indent=2))
+            _configs_cache = ((await aiofiles.os.stat(SLACK_CONFIG_PATH)).st_mtime_ns, configs)
+            return True
+        except Exception as e:
+            # Callers may have changed the cached dict; read the file again next time
+            _configs_cache = None
+            logger.error(f"Error saving slack configs: {e}")
+            return False
+
+# Saves of last_processed within this many seconds of each other are written once
+SLACK_CONFIG_SAVE_DELAY = 1.0
+_pending_save: Optional[asyncio.Task] = None
+# Bumped on every scheduled save, so a save already writing knows it must write again
+_save_generation = 0
+_pending_configs: Optional[Dict[str, SlackChannelSettings]] = None
+
+def schedule_channel_configs_save(configs: Dict[str, SlackChannelSettings]):
+    """Save configs shortly, coalescing with any other save requested in the meantime"""
+    global _pending_save, _save_generation, _pending_configs
+    _save_generation += 1
+    _pending_configs = configs
+    if _pending_save is None or _pending_save.done():
+        _pending_save = asyncio.create_task(_save_channel_configs_later())
+
+async def _save_channel_configs_later():
+    saved_generation = None
+    while saved_generation != _save_generation:
+        await asyncio.sleep(SLACK_CONFIG_SAVE_DELAY)
+        saved_generation = _save_generation
+        await save_channel_configs(_pending_configs)
 
-def get_slack_client():
-    """Get a Slack client using the stored API token"""
+async def flush_channel_configs():
+    """Write out a pending coalesced config save"""
+    if _pending_save is not None and not _pending_save.done():
+        await _pending_save
+
+# One HTTP session and client shared by all requests, so connections to Slack stay warm
+_http_session: Optional[aiohttp.ClientSession] = None
+_client: Optional[AsyncWebClient] = None
+
+async def get_slack_client() -> AsyncWebClient:
+    """Get the shared Slack client for the stored API token"""
+    global _http_session, _client
     token = retrieve_secret("SLACK_API_TOKEN")
     if not token:
         raise HTTPException(status_code=400, detail="Slack API token not configured")
-    
-    return WebClient(token=token)
 
-# Add a retry decorator for handling rate limits
-def retry_with_backoff(max_retries=None, initial_backoff=None, max_backoff=None):
-    """Retry decorator with exponential backoff for handling rate limits"""
-    def decorator(func):
-        async def wrapper(*args, **kwargs):
-            # Use global settings or provided values
-            nonlocal max_retries, initial_backoff, max_backoff
-            max_retries = max_retries or rate_limit_settings["max_retries"]
-            initial_backoff = initial_backoff or rate_limit_settings["initial_backoff"]
-            max_backoff = max_backoff or rate_limit_settings["max_backoff"]
-            
-            retries = 0
-            backoff = initial_backoff
-            
-            while True:
-                try:
-                    return await func(*args, **kwargs)
-                except SlackApiError as e:
-                    # Check if it's a rate limiting error
-                    if "ratelimited" in str(e).lower() or e.response.status_code == 429:
-                        if retries >= max_retries:
-                            logger.error(f"Maximum retries ({max_retries}) exceeded for rate limit")
-                            raise
-                        
-                        # Get retry_after if available, otherwise use exponential backoff
-                        retry_after = e.response.headers.get("Retry-After", None)
-                        if retry_after:
-                            backoff = float(retry_after)
-                        
-                        # Add some jitter to avoid all clients retrying simultaneously
-                        jitter = random.uniform(0, 0.3 * backoff)
-                        backoff_with_jitter = backoff + jitter
-                        
-                        logger.warning(f"Rate limited by Slack API. Retrying in {backoff_with_jitter:.2f}s (retry {retries+1}/{max_retries})")
-                        
-                        # Wait before retrying
-                        await asyncio.sleep(backoff_with_jitter)
-                        
-                        # Increase backoff for next iteration
-                        backoff = min(backoff * 2, max_backoff)
-                        retries += 1
-                    else:
-                        # If it's not a rate limiting error, just raise it
-                        raise
-                        
-        return wrapper
-    return decorator
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(
+            limit=50,
+            limit_per_host=20,
+            ttl_dns_cache=300,
+            keepalive_timeout=60
+        ))
+        _client = None
+    # Rebuild the client (on the same session) if the token was changed
+    if _client is None or _client.token != token:
+        _client = AsyncWebClient(token=token, session=_http_session)
+    return _client
+
+async def close_slack_client():
+    """Close the shared Slack HTTP session"""
+    global _http_session, _client
+    if _http_session is not None:
+        await _http_session.close()
+    _http_session = None
+    _client = None
 
 @router.post("/config")
 async def configure_slack(config: SlackConfig):
     """Configure Slack API keys"""
     try:
         # Validate the token by making a test API call
-        client = WebClient(token=config.api_token)
-        test_result = client.api_test()
+        client = AsyncWebClient(token=config.api_token)
+        test_result = await client.api_test()
         
         if not test_result["ok"]:
             raise HTTPException(status_code=400, detail="Invalid Slack API token")
@@ -159,36 +206,34 @@ async def configure_slack(config: SlackConfig):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/channels")
-async def configure_channel(config: SlackChannelConfig):
+async def configure_channel(config: SlackChannelConfig, client: AsyncWebClient = Depends(get_slack_client)):
     """Configure a Slack channel for document extraction"""
     try:
         # Validate the product exists
-        all_products = product_service.get_all_products()
-        if config.product not in all_products:
+        if config.product not in product_service.products_set:
             raise HTTPException(status_code=400, detail=f"Invalid product: {config.product}")
         
         # Validate the channel ID by trying to get info about it
-        client = get_slack_client()
         try:
-            channel_info = client.conversations_info(channel=config.channel_id)
+            channel_info = await safe_slack_api_call(client, "conversations_info", channel=config.channel_id)
             channel_name = channel_info["channel"]["name"]
         except SlackApiError as e:
             raise HTTPException(status_code=400, detail=f"Invalid channel ID: {config.channel_id}")
         
         # Load existing configurations
-        configs = load_channel_configs()
+        configs = await load_channel_configs()
         
         # Add or update this configuration
-        configs[config.channel_id] = {
-            "product": config.product,
-            "include_threads": config.include_threads,
-            "max_messages": config.max_messages,
-            "description": config.description or f"Channel: {channel_name}",
-            "last_processed": None
-        }
+        configs[config.channel_id] = SlackChannelSettings(
+            product=config.product,
+            include_threads=config.include_threads,
+            max_messages=config.max_messages,
+            channel_name=channel_name,
+            description=config.description or f"Channel: {channel_name}"
+        )
         
         # Save configurations
-        if not save_channel_configs(configs):
+        if not await save_channel_configs(configs):
             raise HTTPException(status_code=500, detail="Failed to save channel configuration")
         
         return {
@@ -207,8 +252,9 @@ async def safe_slack_api_call(client, method_name, *args, **kwargs):
     """Make a Slack API call with retry and rate limit handling"""
     retries = 0
     max_retries = rate_limit_settings["max_retries"]
-    backoff = rate_limit_settings["initial_backoff"]
+    initial_backoff = rate_limit_settings["initial_backoff"]
     max_backoff = rate_limit_settings["max_backoff"]
+    backoff = initial_backoff
     
     while True:
         try:
@@ -216,7 +262,7 @@ async def safe_slack_api_call(client, method_name, *args, **kwargs):
             method = getattr(client, method_name)
             
             # Call the method with the provided arguments
-            result = method(*args, **kwargs)
+            result = await method(*args, **kwargs)
             return result
             
         except SlackApiError as e:
@@ -226,29 +272,40 @@ async def safe_slack_api_call(client, method_name, *args, **kwargs):
                     logger.error(f"Maximum retries ({max_retries}) exceeded for rate limit on {method_name}")
                     raise
                 
-                # Get retry_after if available, otherwise use exponential backoff
+                # Decorrelated jitter: wait a random time between the base and 3x the
+                # previous wait, so concurrent callers don't retry in lockstep
+                backoff = min(max_backoff, random.uniform(initial_backoff, backoff * 3))
+
+                # Never retry sooner than Slack asked us to
                 retry_after = e.response.headers.get("Retry-After", None)
                 if retry_after:
-                    backoff = float(retry_after)
-                
-                # Add some jitter to avoid all clients retrying simultaneously
-                jitter = random.uniform(0, 0.3 * backoff)
-                backoff_with_jitter = backoff + jitter
+                    backoff = max(backoff, float(retry_after))
                 
-                logger.warning(f"Rate limited by Slack API for {method_name}. Retrying in {backoff_with_jitter:.2f}s (retry {retries+1}/{max_retries})")
+                logger.warning(f"Rate limited by Slack API for {method_name}. Retrying in {backoff:.2f}s (retry {retries+1}/{max_retries})")
                 
                 # Wait before retrying
-                await asyncio.sleep(backoff_with_jitter)
-                
-                # Increase backoff for next iteration
-                backoff = min(backoff * 2, max_backoff)
+                await asyncio.sleep(backoff)
                 retries += 1
             else:
                 # If it's not a rate limiting error, just raise it
                 raise
 
-# Create a simple user cache to reduce API calls
-user_cache = {}
+# Create a simple user cache to reduce API calls; least recently used first
+user_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+async def iter_pages(client, method_name: str, page_delay: float = 0.0, **kwargs) -> AsyncIterator[Dict]:
+    """Yield every page of a cursor-paginated Slack API method, each fetched through safe_slack_api_call"""
+    cursor = None
+    while True:
+        response = await safe_slack_api_call(client, method_name, cursor=cursor, **kwargs)
+        yield response
+        
+        # Slack signals the last page with an empty next_cursor; short pages can occur mid-stream
+        cursor = response.get("response_metadata", {}).get("next_cursor")
+        if not cursor:
+            return
+        if page_delay:
+            await asyncio.sleep(page_delay)
 
 def cache_user_info(max_size=500, ttl=3600):
     """Decorator to cache user info and handle expiration"""
@@ -257,23 +314,22 @@ def cache_user_info(max_size=500, ttl=3600):
         async def wrapper(client, user_id, *args, **kwargs):
             # Check if in cache and not expired
             now = time.time()
-            if user_id in user_cache:
-                user_data, timestamp = user_cache[user_id]
-                # If not expired, return cached result
+            cached = user_cache.get(user_id)
+            if cached is not None:
+                user_data, timestamp = cached
+                # If not expired, mark as recently used and return cached result
                 if now - timestamp < ttl:
+                    user_cache.move_to_end(user_id)
                     return user_data
-            
-            # Limit cache size
-            if len(user_cache) >= max_size:
-                # Remove the oldest entries
-                oldest_key = min(user_cache.keys(), key=lambda k: user_cache[k][1])
-                user_cache.pop(oldest_key)
+                del user_cache[user_id]
             
             # Get actual data
             result = await func(client, user_id, *args, **kwargs)
             
-            # Cache the result with timestamp
+            # Cache the result with timestamp, evicting the least recently used entry
             user_cache[user_id] = (result, now)
+            if len(user_cache) > max_size:
+                user_cache.popitem(last=False)
             
             return result
         return wrapper
@@ -282,80 +338,82 @@ def cache_user_info(max_size=500, ttl=3600):
 @cache_user_info(max_size=500, ttl=3600)  # Cache for 1 hour
 async def get_user_info(client, user_id):
     """Get user info with caching and rate limit handling"""
+    return await safe_slack_api_call(client, "users_info", user=user_id)
+
+async def refresh_channel_names(configs: Dict[str, SlackChannelSettings], channel_ids: List[str]):
+    """Fetch the current names of the given channels from Slack and store them in their configs"""
+    client = await get_slack_client()
+    sem = asyncio.Semaphore(SLACK_CONCURRENCY)
+
+    async def fetch_channel_name(channel_id: str) -> Optional[str]:
+        async with sem:
+            try:
+                channel_info = await safe_slack_api_call(client, "conversations_info", channel=channel_id)
+                return channel_info["channel"]["name"]
+            except SlackApiError as e:
+                # For API errors, treat as inaccessible
+                logger.warning(f"Slack API error for channel {channel_id}: {str(e)}")
+            except Exception as e:
+                logger.warning(f"Error fetching info for channel {channel_id}: {str(e)}")
+            return None
+
+    # One paginated conversations.list call covers most channels at once
+    wanted = set(channel_ids)
+    names: Dict[str, str] = {}
     try:
-        # Make synchronous API call
-        user_info = client.users_info(user=user_id)
-        return user_info
+        async for response in iter_pages(client, "conversations_list",
+                                         types="public_channel,private_channel", limit=1000):
+            for channel in response["channels"]:
+                if channel["id"] in wanted:
+                    names[channel["id"]] = channel["name"]
+            if len(names) == len(wanted):
+                break
     except SlackApiError as e:
-        if "ratelimited" in str(e).lower() or e.response.status_code == 429:
-            # Handle rate limiting
-            retry_after = e.response.headers.get("Retry-After", "1")
-            backoff = float(retry_after)
-            logger.warning(f"Rate limited when fetching user info. Waiting {backoff}s")
-            await asyncio.sleep(backoff + 0.5)
-            
-            # Try one more time
-            return client.users_info(user=user_id)
-        else:
-            # Re-raise other errors
-            raise
+        logger.warning(f"Slack API error listing channels: {str(e)}")
+
+    # Look up anything the listing didn't include (e.g. missing scopes) one by one
+    missing = [channel_id for channel_id in channel_ids if channel_id not in names]
+    missing_names = await asyncio.gather(*(fetch_channel_name(channel_id) for channel_id in missing))
+    names.update(
+        (channel_id, channel_name)
+        for channel_id, channel_name in zip(missing, missing_names)
+        if channel_name is not None
+    )
+
+    # Inaccessible channels are left without a name so they are retried next time
+    for channel_id, channel_name in names.items():
+        configs[channel_id].channel_name = channel_name
+    if names:
+        await save_channel_configs(configs)
 
 @router.get("/channels")
-async def list_channels():
-    """List all configured Slack channels"""
+async def list_channels(refresh: bool = False):
+    """List all configured Slack channels, using the channel names stored at configuration time"""
     try:
-        configs = load_channel_configs()
+        configs = await load_channel_configs()
         
-        # Get channel names for all configured channels
-        client = get_slack_client()
-        result = []
+        # Only ask Slack for names that are missing (older configs) or when a refresh is requested
+        channel_ids = [
+            channel_id for channel_id, channel_config in configs.items()
+            if refresh or channel_config.channel_name is None
+        ]
+        if channel_ids:
+            await refresh_channel_names(configs, channel_ids)
         
-        # Process channels in batches to avoid rate limits
-        for batch_start in range(0, len(configs), 20):
-            batch_channels = list(configs.keys())[batch_start:batch_start + 20]
-            logger.info(f"Processing batch of {len(batch_channels)} channels (batch {batch_start//20 + 1})")
-            
-            # Add delay between batches to avoid rate limits
-            if batch_start > 0:
-                await asyncio.sleep(1)
-            
-            for channel_id in batch_channels:
-                try:
-                    # Call Slack API directly but with rate limit handling
-                    try:
-                        channel_info = client.conversations_info(channel=channel_id)
-                        channel_name = channel_info["channel"]["name"]
-                    except SlackApiError as e:
-                        if "ratelimited" in str(e).lower() or e.response.status_code == 429:
-                            # Handle rate limiting
-                            retry_after = e.response.headers.get("Retry-After", "1")
-                            backoff = float(retry_after)
-                            logger.warning(f"Rate limited when fetching channel info. Waiting {backoff}s")
-                            await asyncio.sleep(backoff + 0.5)
-                            
-                            # Try one more time after waiting
-                            channel_info = client.conversations_info(channel=channel_id)
-                            channel_name = channel_info["channel"]["name"]
-                        else:
-                            # For other API errors, treat as inaccessible
-                            logger.warning(f"Slack API error for channel {channel_id}: {str(e)}")
-                            channel_name = "Unknown or inaccessible channel"
-                except Exception as e:
-                    logger.warning(f"Error fetching info for channel {channel_id}: {str(e)}")
-                    channel_name = "Unknown or inaccessible channel"
-                    
-                result.append({
-                    "channel_id": channel_id,
-                    "channel_name": channel_name,
-                    "product": configs[channel_id]["product"],
-                    "description": configs[channel_id].get("description", ""),
-                    "last_processed": configs[channel_id].get("last_processed", None)
-                })
-                
-                # Small delay between channel info requests
-                await asyncio.sleep(0.2)
+        result = [
+            {
+                "channel_id": channel_id,
+                "channel_name": channel_config.channel_name or "Unknown or inaccessible channel",
+                "product": channel_config.product,
+                "description": channel_config.description or "",
+                "last_processed": channel_config.last_processed
+            }
+            for channel_id, channel_config in configs.items()
+        ]
         
         return {"channels": result}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing Slack channels: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -364,15 +422,15 @@ async def list_channels():
 async def delete_channel(channel_id: str):
     """Remove a Slack channel configuration"""
     try:
-        configs = load_channel_configs()
+        configs = await load_channel_configs()
         
         if channel_id not in configs:
             raise HTTPException(status_code=404, detail=f"Channel ID {channel_id} not found in configurations")
         
-        product = configs[channel_id]["product"]
+        product = configs[channel_id].product
         del configs[channel_id]
         
-        if not save_channel_configs(configs):
+        if not await save_channel_configs(configs):
             raise HTTPException(status_code=500, detail="Failed to save channel configuration")
         
         return {
@@ -385,295 +443,334 @@ async def delete_channel(channel_id: str):
         logger.error(f"Error deleting Slack channel: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Messages requested per conversations.history page
+SLACK_HISTORY_PAGE_SIZE = 200
+
+# A document batch is handed to the vector store once it reaches either limit;
+# tokens are estimated as characters / 4
+SLACK_BATCH_TOKEN_BUDGET = 8000
+SLACK_BATCH_MAX_DOCUMENTS = 256
+
+# Document batches that may wait for the vector store while the next pages are fetched
+SLACK_PENDING_BATCHES = 4
+
+# Message subtypes that are channel events rather than conversation
+SLACK_SKIP_SUBTYPES = frozenset({
+    "channel_join", "channel_leave", "channel_topic", "channel_purpose",
+    "channel_name", "channel_archive", "channel_unarchive"
+})
+
+async def iter_history(client: AsyncWebClient, channel_id: str, oldest: Optional[str],
+                       max_n: int) -> AsyncIterator[Dict]:
+    """Yield up to max_n channel messages as each page of history arrives"""
+    if max_n <= 0:
+        return
+    
+    remaining_msg_count = max_n
+    page_count = 0
+    
+    # Pace page requests to stay clear of the conversations.history rate limit
+    async for response in iter_pages(client, "conversations_history", page_delay=1.0,
+                                     channel=channel_id, oldest=oldest,
+                                     limit=min(SLACK_HISTORY_PAGE_SIZE, max_n)):
+        page_count += 1
+        page_messages = response["messages"][:remaining_msg_count]
+        logger.info(f"Retrieved {len(page_messages)} messages from page {page_count}")
+        for msg in page_messages:
+            yield msg
+        
+        remaining_msg_count -= len(page_messages)
+        if remaining_msg_count <= 0:
+            break
+    
+    logger.info(f"Fetched channel history in {page_count} pages")
+
+async def iter_thread_replies(client: AsyncWebClient, channel_id: str,
+                              thread_ts_set: Set[str]) -> AsyncIterator[Dict]:
+    """Yield thread replies as each thread finishes fetching, at most SLACK_CONCURRENCY threads at a time"""
+    sem = asyncio.Semaphore(SLACK_CONCURRENCY)
+    
+    async def fetch_thread(thread_ts: str) -> List[Dict]:
+        async with sem:
+            logger.info(f"Fetching thread replies for thread ts: {thread_ts}")
+            thread_messages = []
+            
+            try:
+                # Use pagination for threads too; rate limits are retried inside
+                async for thread_response in iter_pages(client, "conversations_replies",
+                                                        channel=channel_id, ts=thread_ts,
+                                                        limit=50):  # Smaller batch size for threads
+                    # Add to our list, excluding the parent message
+                    # (the thread parent has the same ts as thread_ts)
+                    thread_messages.extend(
+                        reply for reply in thread_response["messages"] if reply["ts"] != thread_ts
+                    )
+                return thread_messages
+            except Exception as e:
+                # Skip this thread but continue with others
+                logger.warning(f"Error fetching thread {thread_ts}: {str(e)}")
+                return []
+    
+    reply_count = 0
+    for next_thread in asyncio.as_completed([fetch_thread(thread_ts) for thread_ts in thread_ts_set]):
+        thread_messages = await next_thread
+        reply_count += len(thread_messages)
+        for reply in thread_messages:
+            yield reply
+    
+    logger.info(f"Retrieved {reply_count} replies from {len(thread_ts_set)} threads")
+
+async def iter_channel_messages(client: AsyncWebClient, channel_id: str, oldest: Optional[str],
+                                max_n: int, include_threads: bool) -> AsyncIterator[Dict]:
+    """Yield channel history followed by the replies of any threads seen in it"""
+    thread_ts_set = set()
+    async for msg in iter_history(client, channel_id, oldest, max_n):
+        # Only thread parents with replies need fetching; broadcast replies
+        # carry their parent's thread_ts but the parent is fetched on its own
+        thread_ts = msg.get("thread_ts")
+        if thread_ts and thread_ts == msg.get("ts") and msg.get("reply_count", 0) > 0:
+            thread_ts_set.add(thread_ts)
+        yield msg
+    
+    # Get thread replies if configured with rate limit handling
+    if include_threads:
+        logger.info(f"Thread processing is enabled - found {len(thread_ts_set)} threads to process")
+        async for reply in iter_thread_replies(client, channel_id, thread_ts_set):
+            yield reply
+
+def message_to_document(msg: Dict, channel_id: str, product: str) -> Optional[Document]:
+    """Build a document from a Slack message, or None if it has no useful content"""
+    # Skip empty messages (including bot messages without text) and channel events
+    text = msg.get("text") or ""
+    if not text.strip() or msg.get("subtype") in SLACK_SKIP_SUBTYPES:
+        return None
+    
+    # # Get user info for context with caching
+    # user_id = msg.get("user")
+    # user_name = "Unknown User"
+    #
+    # if user_id:
+    #     try:
+    #         # Use cached user info if possible, to speed up processing
+    #         if user_id in user_cache:
+    #             user_data, _ = user_cache[user_id]
+    #             user_name = user_data["user"]["real_name"]
+    #         else:
+    #             # Only call API if not cached
+    #             user_info = client.users_info(user=user_id)
+    #             user_name = user_info["user"]["real_name"]
+    #             # Cache the result
+    #             user_cache[user_id] = (user_info, time.time())
+    #     except Exception as e:
+    #         logger.warning(f"Error fetching user info for {user_id}: {str(e)}")
+    
+    # Create document with user context
+    doc_text = f"Message in  Slack:\n\n{text}"
+    
+    # Add timestamp as a date for better context
+    ts = msg.get("ts")
+    message_date = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(float(ts or 0)))
+    
+    return Document(
+        page_content=doc_text,
+        metadata={
+            "source": "slack",
+            "channel_id": channel_id,
+            #"user": user_name,
+            "timestamp": message_date,
+            "message_ts": ts,
+            "thread_ts": msg.get("thread_ts"),
+            "product": product,
+            "title": f"Slack message  on {message_date}"
+        }
+    )
+
+def store_documents(batch: List[Document], product: str) -> int:
+    """Add a batch of documents to the vector store; returns the number of chunks stored.
+
+    Embedding and the index write are blocking, so callers run this in a worker thread.
+    """
+    chunks_stored = 0
+    try:
+        # Check if the vectorstore has a batch method
+        if hasattr(url_store, 'add_documents_to_vectorstore'):
+            chunks_stored = url_store.add_documents_to_vectorstore(batch, product)
+            logger.info(f"Batch stored {chunks_stored} chunks")
+        else:
+            # Fall back to individual processing
+            for doc in batch:
+                chunks_stored += url_store.add_document_to_vectorstore(doc, product)
+            logger.info(f"Individually stored {chunks_stored} chunks")
+    except Exception as e:
+        logger.error(f"Error processing batch: {str(e)}")
+        # Fall back to individual processing on batch failure
+        for doc in batch:
+            try:
+                chunks_stored += url_store.add_document_to_vectorstore(doc, product)
+            except Exception as inner_e:
+                logger.error(f"Error processing document: {str(inner_e)}")
+    return chunks_stored
+
+# Registered before /process/{channel_id} so "all" isn't taken as a channel id
+@router.post("/process/all")
+async def process_all_channels(force_full: bool = False,
+                               client: AsyncWebClient = Depends(get_slack_client)):
+    """Process all configured Slack channels"""
+    try:
+        logger.info(f"Starting to process all Slack channels (force_full={force_full})")
+        configs = await load_channel_configs()
+        logger.info(f"Found {len(configs)} configured channels")
+        
+        results = {}
+        success_count = 0
+        failure_count = 0
+        total_messages = 0
+        total_chunks = 0
+        
+        # Process up to batch_size channels at a time; Slack rate limits are
+        # absorbed per call by safe_slack_api_call's backoff
+        batch_size = rate_limit_settings["batch_size"]
+        logger.info(f"Processing channels with concurrency {batch_size}")
+        sem = asyncio.Semaphore(batch_size)
+        
+        async def run(channel_id: str) -> Dict:
+            async with sem:
+                logger.info(f"Processing channel {channel_id} for product {configs[channel_id].product}")
+                return await process_channel(channel_id, force_full, client)
+        
+        channel_ids = list(configs.keys())
+        channel_results = await asyncio.gather(*(run(channel_id) for channel_id in channel_ids),
+                                               return_exceptions=True)
+        
+        for channel_id, result in zip(channel_ids, channel_results):
+            if isinstance(result, Exception):
+                failure_count += 1
+                results[channel_id] = {
+                    "success": False,
+                    "error": str(result)
+                }
+                logger.error(f"Failed to process channel {channel_id}: {str(result)}")
+                continue
+            
+            results[channel_id] = {
+                "success": True,
+                "messages_processed": result["messages_processed"],
+                "chunks_stored": result["chunks_stored"]
+            }
+            success_count += 1
+            total_messages += result["messages_processed"]
+            total_chunks += result["chunks_stored"]
+            logger.info(f"Successfully processed channel {channel_id}: {result['messages_processed']} messages, {result['chunks_stored']} chunks")
+        
+        logger.info(f"Finished processing all channels: {success_count} succeeded, {failure_count} failed")
+        logger.info(f"Total messages processed: {total_messages}, total chunks stored: {total_chunks}")
+        
+        return {
+            "message": f"Processed {len(configs)} Slack channels ({success_count} succeeded, {failure_count} failed)",
+            "results": results,
+            "summary": {
+                "total_channels": len(configs),
+                "successful_channels": success_count,
+                "failed_channels": failure_count,
+                "total_messages_processed": total_messages,
+                "total_chunks_stored": total_chunks
+            }
+        }
+    except Exception as e:
+        logger.error(f"Error processing all Slack channels: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/process/{channel_id}")
-async def process_channel(channel_id: str, force_full: bool = False):
+async def process_channel(channel_id: str, force_full: bool = False,
+                          client: AsyncWebClient = Depends(get_slack_client)):
     """Process messages from a Slack channel and store as documents"""
     try:
         logger.info(f"Starting to process Slack channel: {channel_id} (force_full={force_full})")
         
         # Load channel configuration
-        configs = load_channel_configs()
+        configs = await load_channel_configs()
         
         if channel_id not in configs:
             logger.error(f"Channel ID {channel_id} not found in configurations")
             raise HTTPException(status_code=404, detail=f"Channel ID {channel_id} not found in configurations")
         
         channel_config = configs[channel_id]
-        product = channel_config["product"]
+        product = channel_config.product
         logger.info(f"Processing channel for product: {product}")
-        logger.info(f"Channel configuration: include_threads={channel_config['include_threads']}, max_messages={channel_config['max_messages']}")
-        
-        # Get Slack client
-        client = get_slack_client()
-        logger.info("Slack client initialized successfully")
+        logger.info(f"Channel configuration: include_threads={channel_config.include_threads}, max_messages={channel_config.max_messages}")
         
         # Get messages from the channel with rate limit handling
         try:
             # Determine how far back to go
             oldest = None
-            if not force_full and channel_config.get("last_processed"):
-                oldest = channel_config["last_processed"]
+            if not force_full and channel_config.last_processed:
+                oldest = channel_config.last_processed
                 last_date = datetime.fromtimestamp(float(oldest)).strftime("%Y-%m-%d %H:%M:%S")
                 logger.info(f"Fetching messages since: {last_date} (timestamp: {oldest})")
             else:
                 logger.info("Fetching all messages (no timestamp filter)")
             
-            # Get messages from the channel
-            logger.info(f"Requesting {channel_config['max_messages']} messages from Slack API")
+            logger.info(f"Requesting {channel_config.max_messages} messages from Slack API")
             
-            # Use cursor-based pagination to handle large channels
-            messages = []
-            cursor = None
-            page_count = 0
-            remaining_msg_count = channel_config["max_messages"]
-            
-            # Configure batch size to avoid rate limits
-            batch_size = min(100, remaining_msg_count)  # Slack API max is 1000, but we use smaller batches
+            # Two-stage pipeline: the producer fetches messages and builds document
+            # batches while the consumer embeds and stores the previous batch
+            batches: asyncio.Queue = asyncio.Queue(maxsize=SLACK_PENDING_BATCHES)
+            documents_count = 0
+            skipped_count = 0
+            chunks_stored = 0
+            newest_ts = 0.0
             
-            while remaining_msg_count > 0 and (page_count == 0 or cursor):
-                page_count += 1
-                logger.info(f"Fetching message page {page_count} (batch size: {batch_size})")
-                
-                # Add delay between requests to avoid rate limiting
-                if page_count > 1:
-                    # Add a small delay between API calls
-                    await asyncio.sleep(1.0)  # 1 second delay
-                
+            async def producer():
+                nonlocal documents_count, skipped_count, newest_ts
+                batch: List[Document] = []
+                batch_tokens = 0
                 try:
-                    # Call Slack API with pagination
-                    response = client.conversations_history(
-                        channel=channel_id,
-                        cursor=cursor,
-                        limit=batch_size,
-                        oldest=oldest
-                    )
-                    
-                    # Get messages from response
-                    page_messages = response["messages"]
-                    logger.info(f"Retrieved {len(page_messages)} messages from page {page_count}")
-                    
-                    # Add messages to our list
-                    messages.extend(page_messages)
-                    
-                    # Update cursor and remaining count
-                    cursor = response.get("response_metadata", {}).get("next_cursor", None)
-                    remaining_msg_count -= len(page_messages)
-                    
-                    # If we got fewer messages than requested, there are no more
-                    if len(page_messages) < batch_size:
-                        logger.info(f"Reached end of channel history after {page_count} pages")
-                        break
+                    async for msg in iter_channel_messages(client, channel_id, oldest,
+                                                           channel_config.max_messages,
+                                                           channel_config.include_threads):
+                        newest_ts = max(newest_ts, float(msg.get("ts", 0)))
                         
-                    # Update batch size for next request
-                    batch_size = min(100, remaining_msg_count)
-                    
-                except SlackApiError as e:
-                    if "ratelimited" in str(e).lower() or e.response.status_code == 429:
-                        retry_after = e.response.headers.get("Retry-After", "1")
-                        backoff = float(retry_after)
-                        logger.warning(f"Rate limited during pagination. Waiting {backoff}s before retry")
-                        await asyncio.sleep(backoff + 0.5)  # Add a small buffer
-                        # Don't update cursor or counts - we'll retry the same request
-                    else:
-                        # For other errors, log and re-raise
-                        logger.error(f"Error fetching messages: {str(e)}")
-                        raise
-            
-            logger.info(f"Total messages retrieved: {len(messages)}")
-            
-            # Get thread replies if configured with rate limit handling
-            if channel_config["include_threads"]:
-                logger.info("Thread processing is enabled - fetching thread replies")
-                thread_count = 0
-                reply_count = 0
-                
-                # Extract all thread timestamps
-                thread_ts_list = [msg.get("thread_ts") for msg in messages if msg.get("thread_ts")]
-                thread_ts_set = set(thread_ts_list)  # Remove duplicates
-                
-                logger.info(f"Found {len(thread_ts_set)} threads to process")
-                
-                # Process threads with pagination and rate limit handling
-                for i, thread_ts in enumerate(thread_ts_set):
-                    thread_count += 1
-                    
-                    # Log progress in batches
-                    if i % 10 == 0 or i == len(thread_ts_set) - 1:
-                        logger.info(f"Processing thread {i+1}/{len(thread_ts_set)}")
-                    
-                    # Add a small delay between thread requests to avoid rate limits
-                    if i > 0 and i % 5 == 0:
-                        await asyncio.sleep(1.0)  # 1 second delay every 5 threads
-                    
-                    try:
-                        logger.info(f"Fetching thread replies for thread ts: {thread_ts}")
-                        thread_messages = []
-                        thread_cursor = None
-                        
-                        # Use pagination for threads too
-                        while True:
-                            thread_response = client.conversations_replies(
-                                channel=channel_id,
-                                ts=thread_ts,
-                                cursor=thread_cursor,
-                                limit=50  # Smaller batch size for threads
-                            )
-                            
-                            # Get thread messages
-                            page_replies = thread_response["messages"]
-                            
-                            # Add to our list, excluding the parent message
-                            parent_ts = thread_ts  # The thread parent has the same ts as thread_ts
-                            thread_messages.extend([reply for reply in page_replies if reply["ts"] != parent_ts])
-                            
-                            # Check if there are more pages
-                            thread_cursor = thread_response.get("response_metadata", {}).get("next_cursor")
-                            if not thread_cursor:
-                                break
-                            
-                            # Add small delay between pages
-                            await asyncio.sleep(0.5)
-                        
-                        # Add all thread messages to our main list
-                        reply_count += len(thread_messages)
-                        messages.extend(thread_messages)
-                        logger.info(f"Added {len(thread_messages)} replies from thread")
+                        doc = message_to_document(msg, channel_id, product)
+                        if doc is None:
+                            skipped_count += 1
+                            continue
                         
-                    except SlackApiError as e:
-                        if "ratelimited" in str(e).lower() or e.response.status_code == 429:
-                            retry_after = e.response.headers.get("Retry-After", "1")
-                            backoff = float(retry_after)
-                            logger.warning(f"Rate limited during thread fetch. Waiting {backoff}s before retry")
-                            await asyncio.sleep(backoff + 0.5)  # Add a small buffer
-                            # Retry this thread in the next iteration
-                            i -= 1  # Decrement to retry this thread
-                        else:
-                            # For other errors, log and continue with next thread
-                            logger.warning(f"Error fetching thread {thread_ts}: {str(e)}")
-                            # Skip this thread but continue with others
-                
-                logger.info(f"Retrieved {reply_count} replies from {thread_count} threads")
-            
-            # Convert messages to documents
-            documents = []
-            skipped_count = 0
-            
-            logger.info("Starting to process messages into documents")
-            
-            # Process messages in larger batches to optimize performance
-            for msg in messages:
-                # Skip bot messages unless they contain useful content
-                if msg.get("subtype") == "bot_message" and not msg.get("text"):
-                    skipped_count += 1
-                    continue
-                
-                # Get message text 
-                text = msg.get("text", "")
-                
-                # Skip empty messages
-                if not text.strip():
-                    skipped_count += 1
-                    continue
-                
-                # # Get user info for context with caching
-                # user_id = msg.get("user")
-                # user_name = "Unknown User"
-                #
-                # if user_id:
-                #     try:
-                #         # Use cached user info if possible, to speed up processing
-                #         if user_id in user_cache:
-                #             user_data, _ = user_cache[user_id]
-                #             user_name = user_data["user"]["real_name"]
-                #         else:
-                #             # Only call API if not cached
-                #             user_info = client.users_info(user=user_id)
-                #             user_name = user_info["user"]["real_name"]
-                #             # Cache the result
-                #             user_cache[user_id] = (user_info, time.time())
-                #     except Exception as e:
-                #         logger.warning(f"Error fetching user info for {user_id}: {str(e)}")
-                
-                # Create document with user context
-                doc_text = f"Message in  Slack:\n\n{text}"
-                
-                # Add timestamp as a date for better context
-                timestamp = float(msg.get("ts", 0))
-                message_date = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
-                
-                doc = Document(
-                    page_content=doc_text,
-                    metadata={
-                        "source": "slack",
-                        "channel_id": channel_id,
-                        #"user": user_name,
-                        "timestamp": message_date,
-                        "message_ts": msg.get("ts"),
-                        "thread_ts": msg.get("thread_ts"),
-                        "product": product,
-                        "title": f"Slack message  on {message_date}"
-                    }
-                )
-                
-                documents.append(doc)
-            
-            logger.info(f"Created {len(documents)} documents from messages (skipped {skipped_count} messages)")
+                        batch.append(doc)
+                        batch_tokens += len(doc.page_content) // 4
+                        documents_count += 1
+                        if batch_tokens >= SLACK_BATCH_TOKEN_BUDGET or len(batch) >= SLACK_BATCH_MAX_DOCUMENTS:
+                            await batches.put(batch)
+                            batch = []
+                            batch_tokens = 0
+                    
+                    if batch:
+                        await batches.put(batch)
+                finally:
+                    # Always let the consumer finish, even if fetching failed
+                    await batches.put(None)
             
-            # Store documents in vector store using batch processing for better performance
-            chunks_stored = 0
-            logger.info(f"Starting to add {len(documents)} documents to vectorstore for product {product}")
+            async def consumer():
+                nonlocal chunks_stored
+                while (batch := await batches.get()) is not None:
+                    logger.info(f"Storing {len(batch)} documents to vectorstore for product {product}")
+                    chunks_stored += await asyncio.to_thread(store_documents, batch, product)
             
-            # Use batch processing if available in your vector store
-            BATCH_SIZE = 50  # Adjust based on your vector store capabilities
-            
-            for i in range(0, len(documents), BATCH_SIZE):
-                batch = documents[i:i+BATCH_SIZE]
-                batch_size = len(batch)
-                logger.info(f"Processing batch {i//BATCH_SIZE + 1}/{(len(documents) + BATCH_SIZE - 1)//BATCH_SIZE} ({batch_size} documents)")
-                
-                # Try to use batch processing if the method is available
-                try:
-                    # Check if the vectorstore has a batch method
-                    if hasattr(url_store, 'add_documents_to_vectorstore'):
-                        batch_chunks = url_store.add_documents_to_vectorstore(batch, product)
-                        chunks_stored += batch_chunks
-                        logger.info(f"Batch stored {batch_chunks} chunks")
-                    else:
-                        # Fall back to individual processing
-                        batch_chunks = 0
-                        for doc in batch:
-                            chunks = url_store.add_document_to_vectorstore(doc, product)
-                            batch_chunks += chunks
-                            chunks_stored += chunks
-                        logger.info(f"Individually stored {batch_chunks} chunks")
-                    
-                    # Add a small sleep to prevent resource exhaustion
-                    await asyncio.sleep(0.1)
-                    
-                except Exception as e:
-                    logger.error(f"Error processing batch: {str(e)}")
-                    # Fall back to individual processing on batch failure
-                    for doc in batch:
-                        try:
-                            chunks = url_store.add_document_to_vectorstore(doc, product)
-                            chunks_stored += chunks
-                        except Exception as inner_e:
-                            logger.error(f"Error processing document: {str(inner_e)}")
+            await asyncio.gather(producer(), consumer())
             
+            logger.info(f"Created {documents_count} documents from messages (skipped {skipped_count} messages)")
             logger.info(f"Successfully stored {chunks_stored} chunks in vectorstore")
             
             # Update last processed time
-            newest_ts = max([float(msg.get("ts", 0)) for msg in messages]) if messages else None
             if newest_ts:
                 newest_date = datetime.fromtimestamp(newest_ts).strftime("%Y-%m-%d %H:%M:%S")
                 logger.info(f"Updating last_processed timestamp to {newest_date} (timestamp: {newest_ts})")
-                configs[channel_id]["last_processed"] = str(newest_ts)
-                save_channel_configs(configs)
+                configs[channel_id].last_processed = str(newest_ts)
+                schedule_channel_configs_save(configs)
             
             result = {
-                "message": f"Processed {len(documents)} messages from Slack channel, stored {chunks_stored} chunks",
+                "message": f"Processed {documents_count} messages from Slack channel, stored {chunks_stored} chunks",
                 "product": product,
-                "messages_processed": len(documents),
+                "messages_processed": documents_count,
                 "chunks_stored": chunks_stored
             }
             
@@ -689,107 +786,64 @@ async def process_channel(channel_id: str, force_full: bool = False):
         logger.error(f"Unexpected error processing Slack channel {channel_id}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/process/all")
-async def process_all_channels(force_full: bool = False):
-    """Process all configured Slack channels"""
-    try:
-        logger.info(f"Starting to process all Slack channels (force_full={force_full})")
-        configs = load_channel_configs()
-        logger.info(f"Found {len(configs)} configured channels")
-        
-        results = {}
-        success_count = 0
-        failure_count = 0
-        total_messages = 0
-        total_chunks = 0
-        
-        # Get rate limit settings from the global configuration
-        batch_size = rate_limit_settings["batch_size"]
-        batch_delay = rate_limit_settings["batch_delay"]
-        channel_delay = rate_limit_settings["channel_delay"]
-        failure_delay = rate_limit_settings["failure_delay"]
-        
-        logger.info(f"Using rate limit settings: batch_size={batch_size}, batch_delay={batch_delay}s, channel_delay={channel_delay}s")
-        
-        # Process channels in smaller batches to avoid rate limits
-        for batch_start in range(0, len(configs), batch_size):
-            batch_channels = list(configs.keys())[batch_start:batch_start + batch_size]
-            batch_num = batch_start // batch_size + 1
-            total_batches = (len(configs) + batch_size - 1) // batch_size
-            
-            logger.info(f"Processing batch {batch_num}/{total_batches} ({len(batch_channels)} channels)")
-            
-            # Add delay between batches
-            if batch_start > 0:
-                logger.info(f"Waiting {batch_delay} seconds before starting batch {batch_num} to avoid rate limits...")
-                await asyncio.sleep(batch_delay)
-            
-            # Process channels in this batch
-            for channel_id in batch_channels:
-                logger.info(f"Processing channel {channel_id} for product {configs[channel_id]['product']}")
-                try:
-                    result = await process_channel(channel_id, force_full)
-                    results[channel_id] = {
-                        "success": True,
-                        "messages_processed": result["messages_processed"],
-                        "chunks_stored": result["chunks_stored"]
-                    }
-                    success_count += 1
-                    total_messages += result["messages_processed"]
-                    total_chunks += result["chunks_stored"]
-                    logger.info(f"Successfully processed channel {channel_id}: {result['messages_processed']} messages, {result['chunks_stored']} chunks")
-                    
-                    # Add delay between processing channels
-                    logger.info(f"Waiting {channel_delay} seconds before processing next channel...")
-                    await asyncio.sleep(channel_delay)
-                    
-                except Exception as e:
-                    failure_count += 1
-                    results[channel_id] = {
-                        "success": False,
-                        "error": str(e)
-                    }
-                    logger.error(f"Failed to process channel {channel_id}: {str(e)}")
-                    
-                    # Add a longer delay after failure to recover from any rate limiting
-                    logger.info(f"Waiting {failure_delay} seconds to recover after failure...")
-                    await asyncio.sleep(failure_delay)
-        
-        logger.info(f"Finished processing all channels: {success_count} succeeded, {failure_count} failed")
-        logger.info(f"Total messages processed: {total_messages}, total chunks stored: {total_chunks}")
-        
-        return {
-            "message": f"Processed {len(configs)} Slack channels ({success_count} succeeded, {failure_count} failed)",
-            "results": results,
-            "summary": {
-                "total_channels": len(configs),
-                "successful_channels": success_count,
-                "failed_channels": failure_count,
-                "total_messages_processed": total_messages,
-                "total_chunks_stored": total_chunks
-            }
-        }
-    except Exception as e:
-        logger.error(f"Error processing all Slack channels: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+# Block size used when reading a log file backwards from its end
+LOG_TAIL_BLOCK_SIZE = 8192
+
+def tail_offset(f, n: int) -> int:
+    """Byte offset where the last n lines of an open binary file begin, found by reading blocks backwards"""
+    size = f.seek(0, os.SEEK_END)
+    if n <= 0 or size == 0:
+        return size
+    
+    # A trailing newline ends the last line rather than starting a new one
+    f.seek(size - 1)
+    position = size - 1 if f.read(1) == b'\n' else size
+    remaining = n
+    while position > 0:
+        step = min(LOG_TAIL_BLOCK_SIZE, position)
+        position -= step
+        f.seek(position)
+        block = f.read(step)
+        index = len(block)
+        while (index := block.rfind(b'\n', 0, index)) >= 0:
+            remaining -= 1
+            if remaining == 0:
+                return position + index + 1
+    return 0
+
+def tail_file(path: str, n: int) -> List[str]:
+    """Return the last n lines of a file without reading the rest of it"""
+    with open(path, 'rb') as f:
+        f.seek(tail_offset(f, n))
+        return [line.decode('utf-8', errors='replace') for line in f]
+
+def iter_tail_file(f, n: int) -> Iterator[bytes]:
+    """Yield the last n lines of an open binary file in fixed-size blocks, closing it when done"""
+    with f:
+        f.seek(tail_offset(f, n))
+        while block := f.read(LOG_TAIL_BLOCK_SIZE):
+            yield block
 
 @router.get("/logs")
-async def get_slack_logs(lines: int = 100):
-    """Get the most recent Slack processing logs"""
+async def get_slack_logs(lines: int = 100, format: str = "json"):
+    """Get the most recent Slack processing logs, as JSON or (format=text) streamed plain text"""
     try:
         log_file = "logs/slack_processing.log"
-        if not os.path.exists(log_file):
+        try:
+            if format == "text":
+                # Open here rather than in the generator so a missing file is caught below
+                return StreamingResponse(iter_tail_file(open(log_file, 'rb'), lines), media_type="text/plain")
+            
+            # Read only the end of the log file, however large it has grown
+            log_lines = tail_file(log_file, lines)
+        except FileNotFoundError:
+            if format == "text":
+                return Response(content="", media_type="text/plain")
             return {"message": "No logs found", "logs": []}
-            
-        # Read the last 'lines' lines from the log file
-        with open(log_file, 'r') as f:
-            # Use a deque to efficiently get the last N lines
-            from collections import deque
-            log_lines = deque(f, lines)
         
         return {
             "message": f"Retrieved last {len(log_lines)} lines of logs",
-            "logs": list(log_lines)
+            "logs": log_lines
         }
     except Exception as e:
         logger.error(f"Error retrieving logs: {str(e)}")
@@ -797,10 +851,7 @@ async def get_slack_logs(lines: int = 100):
 
 # Add this model for rate limit configuration
 class RateLimitConfig(BaseModel):
-    batch_size: int = 5  # Number of channels to process in a batch
-    batch_delay: int = 30  # Seconds to wait between batches
-    channel_delay: int = 5  # Seconds to wait between channels
-    failure_delay: int = 10  # Seconds to wait after failure
+    batch_size: int = 5  # Number of channels processed at once
     max_retries: int = 5  # Maximum number of retries
     initial_backoff: float = 1.0  # Initial backoff in seconds
     max_backoff: float = 60.0  # Maximum backoff in seconds
@@ -808,26 +859,25 @@ class RateLimitConfig(BaseModel):
 # Define global rate limit settings with defaults
 rate_limit_settings = {
     "batch_size": 5,
-    "batch_delay": 30,
-    "channel_delay": 5,
-    "failure_delay": 10,
     "max_retries": 5,
     "initial_backoff": 1.0,
     "max_backoff": 60.0
 }
 
 # Add configuration path to store rate limit settings
-RATE_LIMIT_CONFIG_PATH = "config/slack_rate_limits.json"
-os.makedirs(os.path.dirname(RATE_LIMIT_CONFIG_PATH), exist_ok=True)
+RATE_LIMIT_CONFIG_PATH = Path("config/slack_rate_limits.json")
+RATE_LIMIT_CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
 
 # Initialize settings from file if it exists
-if os.path.exists(RATE_LIMIT_CONFIG_PATH):
-    try:
-        with open(RATE_LIMIT_CONFIG_PATH, 'r') as f:
-            loaded_settings = json.load(f)
-            rate_limit_settings.update(loaded_settings)
-    except Exception as e:
-        logger.error(f"Error loading rate limit settings: {e}")
+try:
+    with open(RATE_LIMIT_CONFIG_PATH, 'rb') as f:
+        saved = orjson.loads(f.read())
+    # Ignore settings dropped since the file was written (e.g. the old fixed delays)
+    rate_limit_settings.update({k: v for k, v in saved.items() if k in rate_limit_settings})
+except FileNotFoundError:
+    pass
+except Exception as e:
+    logger.error(f"Error loading rate limit settings: {e}")
 
 # Add this endpoint to configure rate limits
 @router.post("/rate-limits")
@@ -837,17 +887,13 @@ async def configure_rate_limits(config: RateLimitConfig):
         # Update rate limit settings
         rate_limit_settings.update({
             "batch_size": config.batch_size,
-            "batch_delay": config.batch_delay,
-            "channel_delay": config.channel_delay,
-            "failure_delay": config.failure_delay,
             "max_retries": config.max_retries,
             "initial_backoff": config.initial_backoff,
             "max_backoff": config.max_backoff
         })
         
         # Save settings to file
-        with open(RATE_LIMIT_CONFIG_PATH, 'w') as f:
-            json.dump(rate_limit_settings, f, indent=2)
+        await write_file_atomic(RATE_LIMIT_CONFIG_PATH, orjson.dumps(rate_limit_settings, option=orjson.OPT_INDENT_2))
         
         logger.info(f"Updated rate limit settings: {rate_limit_settings}")
         
@@ -1,14 +1,11 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, HttpUrl
-from typing import List, Dict, Optional
-from services.url_service import url_store
+from typing import Iterator, List, Dict, Optional, Tuple
+from services.url_service import url_store, add_chunks_to_vectorstores
 from services.product_service import product_service
+from services.product_registry import product_registry
 import logging
 from langchain_core.documents import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_chroma import Chroma
-from services.secret_store import retrieve_secret
 import os
 from datetime import datetime
 import requests
@@ -18,11 +15,31 @@ import asyncio
 import shutil
 import tempfile
 import subprocess
-import glob
+from pathlib import Path
 
 router = APIRouter(prefix="/url", tags=["URL"])
 logger = logging.getLogger(__name__)
 
+# Merchant onboarding content injected by /inject-merchant-content, read once at import
+_MERCHANT_TEXT = (Path(__file__).resolve().parent.parent / "content" / "merchant_onboarding.md").read_text()
+_MERCHANT_METADATA = {
+    "url": "https://docs.setu.co/payments/umap/merchant-onboarding",
+    "url_hash": "merchant_onboarding_manual",
+    "domain": "docs.setu.co",
+    "path": "/payments/umap/merchant-onboarding",
+    "type": "url",
+    "depth": 0,
+    "title": "Merchant On-boarding",
+    "section": "payments",
+    "subsection": "umap",
+    "is_setu_docs": True,
+    "product": "UMAP",
+    "source": "manual_injection"
+}
+
+# Maximum number of MDX files read and embedded at once by /github
+GITHUB_FILE_CONCURRENCY = 16
+
 class URLRequest(BaseModel):
     urls: List[HttpUrl]
     product: Optional[str] = None  # Optional product, will be auto-detected if not provided
@@ -39,7 +56,7 @@ async def store_urls(request: URLRequest) -> Dict:
         urls = [str(url) for url in request.urls]
         
         # If product is provided, validate it
-        if request.product and request.product not in product_service.get_all_products():
+        if request.product and request.product not in product_service.products_set:
             raise HTTPException(status_code=400, detail=f"Invalid product: {request.product}")
 
         # Store URLs with automatic product detection
@@ -141,95 +158,22 @@ async def inject_merchant_content() -> Dict:
         # Hardcode the product
         product = "UMAP"
         
-        # Create a document with the merchant onboarding steps
-        merchant_content = """# Merchant On-boarding
-
-## Steps to on-board a merchant
-
-An aggregator can seamlessly on-board merchants onto the UPI Setu ecosystem, and enable them to start accepting UPI payments. This journey starts from collecting a merchant's business details, setting up their configuration and as the final step activation of the merchant's ability to process transactions.
-
-### Step 1 - Share information about merchant
-
-As the first step, the operations team gathers necessary details from the merchant, ensuring that the UPI Setu system has all the relevant information to proceed with the on-boarding process.
-
-### Step 2 - Setup a merchant
-
-After getting the merchant's information, a preliminary verification is conducted. Then, a record for the merchant is created in the UPI Setu system, which formally initiates their on-boarding journey.
-
-Create merchant API is used for this step.
-
-### Step 3 - Register a VPA
-
-A VPA has to be created for the merchant, before they can start transacting on UPI Setu. This gives the merchant the capability to accept payments via UPI, completing the on-boarding process. This can include 2 steps—
-
-#### Check if a VPA is available (optional)
-
-This API helps you check the availability of a desired VPA, to ensure it is unique and can be assigned to the merchant without conflicts.
-
-Check VPA availability API is used for this step.
-
-#### Register VPA (required)
-
-The next API is used to assign a VPA to the merchant. With this, merchant on-boarding is completed seamlessly! The merchant can now initiate transactions on UPI.
-
-Create VPA API is used for this step.
-
-## Manage your merchants
-
-### Update merchant status
-
-If a merchant needs to be disabled by an aggregator then they can call this API to update their status. If a merchant is disabled UPI Setu will decline all transactions to the VPA assigned to this particular merchant.
-
-Update merchant status API is used for this.
-
-### Update merchant details
-
-This API can be called to update the information associated with the merchant like settlement configuration or KYC information that may be required for accepting different payment instruments on UPI.
-
-Update merchant details API is used for this.
-"""
-        
-        # Create the document
+        # Create the document from the preloaded content
         doc = Document(
-            page_content=merchant_content,
-            metadata={
-                "url": "https://docs.setu.co/payments/umap/merchant-onboarding",
-                "url_hash": "merchant_onboarding_manual",
-                "domain": "docs.setu.co",
-                "path": "/payments/umap/merchant-onboarding",
-                "type": "url",
-                "depth": 0,
-                "fetched_at": datetime.now().isoformat(),
-                "title": "Merchant On-boarding",
-                "section": "payments",
-                "subsection": "umap",
-                "is_setu_docs": True,
-                "product": product,
-                "source": "manual_injection" 
-            }
+            page_content=_MERCHANT_TEXT,
+            metadata={**_MERCHANT_METADATA, "fetched_at": datetime.now().isoformat()}
         )
         
         # Split into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
-        )
-        chunks = text_splitter.split_documents([doc])
-        
-        # Get the vectorstore
-        api_key = retrieve_secret("OPENAI_API_KEY")
-        embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-small",
-            openai_api_key=api_key
-        )
+        chunks = url_store.text_splitter.split_documents([doc])
         
-        vectorstore = Chroma(
-            persist_directory=os.path.join("chroma_db", product),
-            embedding_function=embeddings
-        )
+        # Get the resident vectorstore for the product
+        vectorstore = url_store.get_vectorstore(product)
         
-        # Add chunks to vectorstore
-        vectorstore.add_documents(chunks)
+        # Add chunks to vectorstore in batched embedding calls
+        add_chunks_to_vectorstores(chunks, [vectorstore])
+        product_registry.register(product)
+        product_registry.mark_updated(product)
         
         return {
             "message": f"Successfully injected {len(chunks)} chunks of merchant onboarding content",
@@ -276,6 +220,103 @@ async def auto_crawl_url(url: str) -> Dict:
         logger.error(f"Error in auto crawl: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def iter_mdx_files(root: str) -> Iterator[str]:
+    """Yield .mdx file paths under root as the tree is walked, skipping hidden entries like glob does"""
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_mdx_files(entry.path)
+            elif entry.name.endswith('.mdx') and entry.is_file():
+                yield entry.path
+
+def clone_repository(clone_url: str, temp_dir: str, folders: List[str]) -> None:
+    """Clone only the requested folders at HEAD, falling back to a full clone if the server refuses"""
+    sparse_clone = subprocess.run(
+        ["git", "clone", "--depth=1", "--filter=blob:none", "--sparse", clone_url, temp_dir],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    if sparse_clone.returncode == 0:
+        sparse_checkout = subprocess.run(
+            ["git", "-C", temp_dir, "sparse-checkout", "set", *folders],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        if sparse_checkout.returncode == 0:
+            return
+    
+    logger.warning("Sparse clone failed, falling back to a full clone")
+    # git clone needs an empty target directory
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+    subprocess.run(
+        ["git", "clone", clone_url, temp_dir],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE
+    )
+
+def process_mdx_file(mdx_file: str, relative_path: str, owner: str, repo: str,
+                     products_by_upper: Dict[str, str],
+                     products_lower: List[Tuple[str, str]]) -> Tuple[str, int]:
+    """Read an MDX file, detect its product and store it; returns (product, chunks stored)"""
+    # Read the file content
+    with open(mdx_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    
+    # Extract product from file path
+    # Example path: content/payments/umap/overview.mdx
+    path_parts = relative_path.split(os.path.sep)
+    product = None
+    
+    if len(path_parts) >= 3 and path_parts[0] == 'content':
+        # The product is typically the second folder in content/category/product/
+        category = path_parts[1]
+        product_folder = path_parts[2]
+        
+        # Try exact match first
+        product = products_by_upper.get(product_folder.upper())
+        if not product:
+            # Try partial match (some products might be named differently)
+            folder_lower = product_folder.lower()
+            for p, p_lower in products_lower:
+                if p_lower in folder_lower or folder_lower in p_lower:
+                    product = p
+                    break
+    
+    # If product is still None, try to detect from content
+    if not product:
+        # Use a simple keyword-based approach
+        product = url_store.detect_product_from_content(content)
+    
+    if not product:
+        logger.warning(f"Could not detect product for {relative_path}")
+        raise ValueError("Could not detect product")
+    
+    # Create a document for the vector store
+    file_url = f"https://github.com/{owner}/{repo}/blob/main/{relative_path}"
+    file_hash = f"github_{owner}_{repo}_{os.path.basename(mdx_file)}"
+    
+    doc = Document(
+        page_content=content,
+        metadata={
+            "url": file_url,
+            "url_hash": file_hash,
+            "domain": "github.com",
+            "path": relative_path,
+            "type": "github",
+            "fetched_at": datetime.now().isoformat(),
+            "title": os.path.basename(mdx_file).replace('.mdx', ''),
+            "product": product,
+            "source": "github" 
+        }
+    )
+    
+    # Store the document in the vector store
+    return product, url_store.add_document_to_vectorstore(doc, product)
+
 @router.post("/github")
 async def fetch_github_content(request: GitHubRequest) -> Dict:
     """Fetch MDX content from a GitHub repository and automatically detect products"""
@@ -289,7 +330,7 @@ async def fetch_github_content(request: GitHubRequest) -> Dict:
             raise HTTPException(status_code=400, detail="Invalid GitHub URL format")
         
         owner, repo = match.groups()
-        folders = [folder.strip() for folder in request.folders.split(',')]
+        folders = [folder.strip() for folder in request.folders.split(',') if folder.strip()]
         
         # Initialize statistics counters
         stats = {
@@ -315,17 +356,30 @@ async def fetch_github_content(request: GitHubRequest) -> Dict:
         
         # Clone the repository
         try:
-            subprocess.run(
-                ["git", "clone", clone_url, temp_dir],
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
+            clone_repository(clone_url, temp_dir, folders)
             logger.info(f"Successfully cloned repository")
         except subprocess.CalledProcessError as e:
             logger.error(f"Error cloning repository: {e.stderr.decode('utf-8')}")
             raise HTTPException(status_code=500, detail=f"Error cloning repository: {e.stderr.decode('utf-8')}")
         
+        # Length of the "<temp_dir>/" prefix, to turn file paths into repository paths
+        temp_dir_prefix = len(temp_dir) + len(os.path.sep)
+        
+        # Bounds concurrent file reads and embedding calls across all folders
+        sem = asyncio.Semaphore(GITHUB_FILE_CONCURRENCY)
+        
+        # Product lookup tables, built once rather than per file
+        all_products = product_service.get_all_products()
+        products_by_upper = {p.upper(): p for p in all_products}
+        products_lower = [(p, p.lower()) for p in all_products]
+        
+        async def process_file(mdx_file: str):
+            async with sem:
+                return await asyncio.to_thread(
+                    process_mdx_file, mdx_file, mdx_file[temp_dir_prefix:], owner, repo,
+                    products_by_upper, products_lower
+                )
+        
         # Process each requested folder
         for folder in folders:
             folder_path = os.path.join(temp_dir, folder)
@@ -339,96 +393,31 @@ async def fetch_github_content(request: GitHubRequest) -> Dict:
                 
             logger.info(f"Processing folder: {folder}")
             
-            # Find all .mdx files in the folder recursively
-            mdx_pattern = os.path.join(folder_path, "**", "*.mdx")
-            mdx_files = glob.glob(mdx_pattern, recursive=True)
+            # Process the folder's MDX files concurrently, then fold the per-file results
+            mdx_files = list(iter_mdx_files(folder_path))
             
-            logger.info(f"Found {len(mdx_files)} MDX files in {folder}")
+            results = await asyncio.gather(
+                *[process_file(mdx_file) for mdx_file in mdx_files],
+                return_exceptions=True
+            )
             
-            # Process each MDX file
-            for mdx_file in mdx_files:
-                try:
-                    stats["files_processed"] += 1
-                    
-                    # Read the file content
-                    with open(mdx_file, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    
-                    # Get relative path within the repository
-                    relative_path = os.path.relpath(mdx_file, temp_dir)
-                    
-                    # Extract product from file path
-                    # Example path: content/payments/umap/overview.mdx
-                    path_parts = relative_path.split(os.path.sep)
-                    product = None
-                    
-                    if len(path_parts) >= 3 and path_parts[0] == 'content':
-                        # The product is typically the second folder in content/category/product/
-                        category = path_parts[1]
-                        product_folder = path_parts[2]
-                        
-                        # Verify this is a valid product
-                        all_products = product_service.get_all_products()
-                        
-                        # Try exact match first
-                        if product_folder.upper() in all_products:
-                            product = product_folder.upper()
-                        else:
-                            # Try partial match (some products might be named differently)
-                            for p in all_products:
-                                if p.lower() in product_folder.lower() or product_folder.lower() in p.lower():
-                                    product = p
-                                    break
-                    
-                    # If product is still None, try to detect from content
-                    if not product:
-                        # Use a simple keyword-based approach
-                        product = url_store.detect_product_from_content(content)
-                    
-                    if not product:
-                        logger.warning(f"Could not detect product for {relative_path}")
-                        failed_files.append({
-                            "file": relative_path,
-                            "reason": "Could not detect product"
-                        })
-                        stats["failed"] += 1
-                        continue
-                    
-                    # Create a document for the vector store
-                    file_url = f"https://github.com/{owner}/{repo}/blob/main/{relative_path}"
-                    file_hash = f"github_{owner}_{repo}_{os.path.basename(mdx_file)}"
-                    
-                    doc = Document(
-                        page_content=content,
-                        metadata={
-                            "url": file_url,
-                            "url_hash": file_hash,
-                            "domain": "github.com",
-                            "path": relative_path,
-                            "type": "github",
-                            "fetched_at": datetime.now().isoformat(),
-                            "title": os.path.basename(mdx_file).replace('.mdx', ''),
-                            "product": product,
-                            "source": "github" 
-                        }
-                    )
-                    
-                    # Store the document in the vector store
-                    chunks = url_store.add_document_to_vectorstore(doc, product)
-                    
-                    # Update statistics
-                    stats["successful"] += 1
-                    stats["chunks_stored"] += chunks
-                    products_detected[product] = products_detected.get(product, 0) + 1
-                    
-                except Exception as e:
-                    logger.error(f"Error processing file {mdx_file}: {e}")
-                    relative_path = os.path.relpath(mdx_file, temp_dir)
+            for mdx_file, result in zip(mdx_files, results):
+                stats["files_processed"] += 1
+                if isinstance(result, Exception):
+                    logger.error(f"Error processing file {mdx_file}: {result}")
                     failed_files.append({
-                        "file": relative_path,
-                        "reason": str(e)
+                        "file": mdx_file[temp_dir_prefix:],
+                        "reason": str(result)
                     })
                     stats["failed"] += 1
+                    continue
+                
+                product, chunks = result
+                stats["successful"] += 1
+                stats["chunks_stored"] += chunks
+                products_detected[product] = products_detected.get(product, 0) + 1
+            
+            logger.info(f"Processed {len(mdx_files)} MDX files in {folder}")
         
         return {
             "message": (
@@ -3,6 +3,7 @@ from atlassian import Confluence
 from bs4 import BeautifulSoup
 import logging
 from services.secret_store import retrieve_secret
+from services.product_registry import product_registry
 from chromadb import PersistentClient, Collection
 import os
 import re
@@ -257,6 +258,25 @@ class ConfluenceDocStore:
             logger.error(f"Error getting document metadata: {e}")
             return None
 
+    def get_stored_versions(self, vectorstore: Optional[Chroma], page_ids: List[str]) -> Dict[str, str]:
+        """Get the stored version of each page in one collection read"""
+        if not vectorstore or not page_ids:
+            return {}
+        try:
+            results = vectorstore._collection.get(
+                where={"page_id": {"$in": page_ids}},
+                include=["metadatas"]
+            )
+            versions = {}
+            for metadata in results.get("metadatas") or []:
+                page_id = metadata.get("page_id")
+                if page_id and page_id not in versions:
+                    versions[page_id] = metadata.get("version")
+            return versions
+        except Exception as e:
+            logger.error(f"Error getting stored document versions: {e}")
+            return {}
+
     def has_document_changed(self, product: str, page_id: str, new_version: str, new_content: str) -> bool:
         """Check if document has changed"""
         stored_metadata = self.get_document_metadata(product, page_id)
@@ -315,6 +335,10 @@ class ConfluenceDocStore:
                 "updated": 0
             }
             
+            # Open the product's vector store once and look up every stored version up front
+            vectorstore = self.get_vectorstore(product)
+            stored_versions = self.get_stored_versions(vectorstore, document_ids)
+
             for doc_id in document_ids:
                 try:
                     logger.info(f"Processing document tree for ID: {doc_id}")
@@ -332,7 +356,7 @@ class ConfluenceDocStore:
                     new_version = str(main_page.get('version', {}).get('number', '1'))
                     
                     # Check if document has changed
-                    if not self.has_document_changed(product, doc_id, new_version, ""):
+                    if doc_id in stored_versions and stored_versions[doc_id] == new_version:
                         logger.info(f"Document {doc_id} unchanged, skipping")
                         processing_stats["unchanged"] += 1
                         continue
@@ -375,21 +399,23 @@ class ConfluenceDocStore:
             # Split documents into chunks
             chunks = self.text_splitter.split_documents(documents)
             
-            # Create or get the vector store
-            vectorstore = Chroma(
-                persist_directory=os.path.join(self.chroma_dir, product),
-                embedding_function=self.embeddings
-            )
+            # Create the vector store on first ingest for this product
+            if vectorstore is None:
+                vectorstore = Chroma(
+                    persist_directory=os.path.join(self.chroma_dir, product),
+                    embedding_function=self.embeddings
+                )
 
-            # Remove old versions of updated documents
+            # Remove old versions of all updated documents in one delete
             collection = vectorstore._collection
-            for doc in documents:
-                page_id = doc.metadata.get("page_id")
-                if page_id:
-                    collection.delete(where={"page_id": page_id})
+            page_ids = sorted({doc.metadata["page_id"] for doc in documents if doc.metadata.get("page_id")})
+            if page_ids:
+                collection.delete(where={"page_id": {"$in": page_ids}})
 
-            # Add new documents to the vector store
+            # Add all chunks in a single batch; embeddings are requested in bulk
             vectorstore.add_documents(chunks)
+            product_registry.register(product)
+            product_registry.mark_updated(product)
             
             # Get statistics
             count = collection.count()
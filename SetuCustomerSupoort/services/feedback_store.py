@@ -0,0 +1,167 @@
+import sqlite3
+import threading
+import asyncio
+import logging
+import time
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from config import FEEDBACK_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+# Queued feedback is written once this many entries are waiting or after this many seconds
+FEEDBACK_BATCH_SIZE = 128
+FEEDBACK_FLUSH_INTERVAL = 0.05
+
+# Only the latest entries per question are kept, and nothing older than the retention window
+FEEDBACK_MAX_PER_QUESTION = 50
+FEEDBACK_RETENTION_NS = 30 * 24 * 3600 * 10**9
+
+# Timestamps are stored as integer nanoseconds since the epoch and formatted on read.
+# Lookups go through question_key, a fixed-size hash of the normalized question.
+FEEDBACK_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS feedback (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        question TEXT NOT NULL,
+        answer TEXT NOT NULL,
+        feedback TEXT NOT NULL,
+        timestamp INTEGER NOT NULL,
+        question_key TEXT NOT NULL
+    )
+"""
+
+def question_key(question: str) -> str:
+    """Fixed-size key for a question, ignoring case and surrounding whitespace"""
+    return hashlib.blake2b(question.strip().lower().encode(), digest_size=16).hexdigest()
+
+def format_timestamp(timestamp_ns: int) -> str:
+    """Format a stored nanosecond timestamp as an ISO 8601 UTC string"""
+    return datetime.fromtimestamp(timestamp_ns / 1e9, tz=timezone.utc).isoformat()
+
+class FeedbackStore:
+    """SQLite-backed store for answer feedback, keyed by question"""
+
+    def __init__(self, db_path: str = FEEDBACK_DB_PATH):
+        self.db_path = db_path
+        # One shared connection in autocommit mode; writes are serialized by the lock
+        self.conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        self.lock = threading.Lock()
+        self._init_db()
+
+    def _init_db(self):
+        """Initialize the feedback table"""
+        try:
+            with self.lock:
+                self.conn.execute("PRAGMA journal_mode=WAL")
+                self.conn.execute("PRAGMA synchronous=NORMAL")
+                self.conn.execute(FEEDBACK_TABLE_SQL)
+                self.conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_question_key ON feedback (question_key)")
+                self.conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_timestamp ON feedback (timestamp)")
+        except Exception as e:
+            logger.error(f"Error initializing feedback database: {e}")
+            raise
+
+    def add_feedback(self, question: str, answer: str, thumbs_up: bool) -> None:
+        """Record a single feedback entry"""
+        self.add_feedback_batch([(question, answer, thumbs_up, time.time_ns())])
+
+    def add_feedback_batch(self, entries: List[Tuple[str, str, bool, int]]) -> int:
+        """Record many (question, answer, thumbs_up, timestamp_ns) entries in a single transaction"""
+        rows = [
+            (question, question_key(question), answer, "👍" if thumbs_up else "👎", timestamp_ns)
+            for question, answer, thumbs_up, timestamp_ns in entries
+        ]
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(
+                    "INSERT INTO feedback (question, question_key, answer, feedback, timestamp) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._prune({row[1] for row in rows})
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def _prune(self, keys) -> None:
+        """Drop expired entries and trim the given question keys to their latest entries"""
+        self.conn.execute(
+            "DELETE FROM feedback WHERE timestamp < ?",
+            (time.time_ns() - FEEDBACK_RETENTION_NS,)
+        )
+        self.conn.executemany(
+            """
+            DELETE FROM feedback WHERE question_key = ? AND id NOT IN (
+                SELECT id FROM feedback WHERE question_key = ? ORDER BY id DESC LIMIT ?
+            )
+            """,
+            [(key, key, FEEDBACK_MAX_PER_QUESTION) for key in keys]
+        )
+
+    def get_feedback(self, question: str, limit: Optional[int] = None) -> List[Dict]:
+        """Get feedback for a question in submission order, optionally only the latest `limit` entries"""
+        key = question_key(question)
+        query = "SELECT answer, feedback, timestamp FROM feedback WHERE question_key = ? ORDER BY id DESC"
+        params: tuple = (key,)
+        if limit is not None:
+            query += " LIMIT ?"
+            params = (key, limit)
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [
+            {"answer": answer, "feedback": feedback, "timestamp": format_timestamp(timestamp)}
+            for answer, feedback, timestamp in reversed(rows)
+        ]
+
+class FeedbackWriter:
+    """Queues feedback submissions and writes them to the store in batches"""
+
+    def __init__(self, store: FeedbackStore):
+        self.store = store
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def submit(self, question: str, answer: str, thumbs_up: bool) -> None:
+        """Queue a feedback entry for the next batched write, stamped with the submit time"""
+        await self.queue.put((question, answer, thumbs_up, time.time_ns()))
+
+    async def run(self) -> None:
+        """Drain the queue forever, committing up to FEEDBACK_BATCH_SIZE entries at a time"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + FEEDBACK_FLUSH_INTERVAL
+            try:
+                while len(batch) < FEEDBACK_BATCH_SIZE:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # Stopping: these entries are already off the queue, so flush() won't see them
+                await self._write(batch)
+                raise
+            await self._write(batch)
+
+    async def flush(self) -> None:
+        """Write anything still queued, e.g. on shutdown"""
+        batch = []
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        if batch:
+            await self._write(batch)
+
+    async def _write(self, batch: List[Tuple[str, str, bool, int]]) -> None:
+        try:
+            await asyncio.to_thread(self.store.add_feedback_batch, batch)
+        except Exception as e:
+            logger.error(f"Error writing {len(batch)} feedback entries: {e}")
+
+# Create global instances
+feedback_store = FeedbackStore()
+feedback_writer = FeedbackWriter(feedback_store)
@@ -0,0 +1,61 @@
+import os
+import asyncio
+import logging
+from typing import Dict, Set
+
+logger = logging.getLogger(__name__)
+
+# How often the registry re-lists chroma_db to pick up removed products
+PRODUCT_REGISTRY_REFRESH_INTERVAL = 60
+
+class ProductRegistry:
+    """In-memory set of products that have a documentation directory in chroma_db"""
+
+    def __init__(self, chroma_dir: str = "chroma_db"):
+        self.chroma_dir = chroma_dir
+        self._products: Set[str] = set()
+        # product -> number of ingests seen, so answer caches can tell their entries are stale
+        self._generations: Dict[str, int] = {}
+
+    def refresh(self) -> int:
+        """Re-list the product directories; returns how many were found"""
+        try:
+            with os.scandir(self.chroma_dir) as entries:
+                self._products = {entry.name for entry in entries if entry.is_dir()}
+        except FileNotFoundError:
+            self._products = set()
+        return len(self._products)
+
+    def register(self, product: str) -> None:
+        """Record a product whose directory was just created"""
+        self._products.add(product)
+
+    def mark_updated(self, product: str) -> None:
+        """Record that a product's documents were just (re)ingested"""
+        self._generations[product] = self._generations.get(product, 0) + 1
+
+    def generation(self, product: str) -> int:
+        """How many times the product's documents have changed in this process"""
+        return self._generations.get(product, 0)
+
+    def has_product(self, product: str) -> bool:
+        """Check whether a product has documentation, without touching the disk for known products"""
+        if product in self._products:
+            return True
+        # Another worker may have ingested it since the last refresh
+        if os.path.isdir(os.path.join(self.chroma_dir, product)):
+            self._products.add(product)
+            return True
+        return False
+
+    async def refresh_every(self, interval: float = PRODUCT_REGISTRY_REFRESH_INTERVAL) -> None:
+        """Refresh the registry periodically, off the event loop"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.error(f"Error refreshing product registry: {e}")
+
+# Create global instance
+product_registry = ProductRegistry()
@@ -1,5 +1,5 @@
 import json
-from typing import List, Dict
+from typing import List, Dict, FrozenSet, Optional
 import os
 import logging
 from pathlib import Path
@@ -12,6 +12,8 @@ class ProductService:
         self.config_dir.mkdir(exist_ok=True)
         self.config_file = self.config_dir / "product_docs.json"
         self.product_docs = self._load_product_docs()
+        self._products_set: Optional[FrozenSet[str]] = None
+        self._version = 0  # Bumped on every change to product_docs
 
     def _load_product_docs(self) -> Dict[str, List[str]]:
         """Load product docs configuration"""
@@ -55,10 +57,27 @@ class ProductService:
         """Get list of all products"""
         return list(self.product_docs.keys())
 
+    @property
+    def products_set(self) -> FrozenSet[str]:
+        """Set of all products for O(1) membership checks, rebuilt after changes"""
+        if self._products_set is None:
+            self._products_set = frozenset(self.product_docs)
+        return self._products_set
+
+    @property
+    def version(self) -> int:
+        """Counter that changes whenever product_docs is modified"""
+        return self._version
+
+    def _invalidate_products(self) -> None:
+        self._products_set = None
+        self._version += 1
+
     def update_product_docs(self, product: str, doc_ids: List[str]) -> bool:
         """Update document IDs for a product"""
         try:
             self.product_docs[product] = doc_ids
+            self._invalidate_products()
             return self._save_product_docs(self.product_docs)
         except Exception as e:
             logger.error(f"Error updating product docs: {e}")
@@ -103,6 +122,7 @@ class ProductService:
             current_docs = set(self.product_docs.get(product, []))
             current_docs.update(doc_ids)
             self.product_docs[product] = sorted(list(current_docs))  # Sort for consistency
+            self._invalidate_products()
             
             success = self._save_product_docs(self.product_docs)
             if success:
@@ -120,6 +140,7 @@ class ProductService:
             current_docs = set(self.product_docs.get(product, []))
             current_docs.difference_update(doc_ids)
             self.product_docs[product] = list(current_docs)
+            self._invalidate_products()
             return self._save_product_docs(self.product_docs)
         except Exception as e:
             logger.error(f"Error removing product docs: {e}")
@@ -1,10 +1,11 @@
 import sqlite3
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 import os
 from cryptography.fernet import Fernet, InvalidToken
 from contextlib import contextmanager
 import logging
 import json
+import time
 from config import DB_PATH, KEY_PATH, DATA_DIR
 from pathlib import Path
 
@@ -12,10 +13,15 @@ from pathlib import Path
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Seconds a decrypted secret is served from memory before re-reading the database.
+# Kept short because the Gradio app and the API server share the same database.
+SECRET_CACHE_TTL = 60
+
 class SecretStore:
     def __init__(self):
         self.db_path = "data/secrets.db"
         self.key_path = "data/secret.key"
+        self._cache: Dict[str, tuple] = {}
         
         # Ensure directories exist
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
@@ -70,13 +76,24 @@ class SecretStore:
             """, (key, encrypted_value.decode()))
             conn.commit()
             conn.close()
+            self._cache[key] = (value, time.monotonic())
             return True
         except Exception as e:
             logger.error(f"Error storing secret: {e}")
             return False
 
     def retrieve_secret(self, key: str) -> Optional[str]:
-        """Retrieve and decrypt a secret"""
+        """Retrieve and decrypt a secret, served from memory while fresh"""
+        cached = self._cache.get(key)
+        if cached and time.monotonic() - cached[1] < SECRET_CACHE_TTL:
+            return cached[0]
+
+        value = self._read_secret(key)
+        self._cache[key] = (value, time.monotonic())
+        return value
+
+    def _read_secret(self, key: str) -> Optional[str]:
+        """Read and decrypt a secret from the database"""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
@@ -96,6 +113,31 @@ class SecretStore:
             logger.error(f"Error retrieving secret: {e}")
             return None
 
+    def get_many(self, keys: List[str]) -> Dict[str, Optional[str]]:
+        """Read and decrypt several secrets with a single database query"""
+        values: Dict[str, Optional[str]] = {key: None for key in keys}
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            placeholders = ", ".join("?" for _ in keys)
+            cursor.execute(f"SELECT key, value FROM secrets WHERE key IN ({placeholders})", keys)
+            rows = cursor.fetchall()
+            conn.close()
+
+            for key, encrypted_value in rows:
+                try:
+                    values[key] = self.fernet.decrypt(encrypted_value.encode()).decode()
+                except InvalidToken:
+                    logger.error(f"Invalid encryption token for key: {key}")
+        except Exception as e:
+            logger.error(f"Error retrieving secrets: {e}")
+            return values
+
+        now = time.monotonic()
+        for key, value in values.items():
+            self._cache[key] = (value, now)
+        return values
+
     def reset_encryption(self):
         """Reset encryption and re-encrypt all secrets"""
         try:
@@ -147,6 +189,7 @@ class SecretStore:
                 cursor = conn.cursor()
                 cursor.execute("DELETE FROM secrets WHERE key = ?", (key,))
                 conn.commit()
+            self._cache.pop(key, None)
             logger.info(f"Secret deleted successfully: {key}")
             return True
         except Exception as e:
@@ -177,4 +220,5 @@ class SecretStore:
 secret_store = SecretStore()
 store_secret = secret_store.store_secret
 retrieve_secret = secret_store.retrieve_secret
+get_many = secret_store.get_many
 reset_encryption = secret_store.reset_encryption
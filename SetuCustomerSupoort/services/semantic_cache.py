@@ -0,0 +1,60 @@
+import time
+import logging
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A cached answer is reused when a new question's embedding is at least this similar
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_TTL = 3600  # seconds
+SEMANTIC_CACHE_SIZE = 1024  # entries per product
+
+def _normalize(embedding) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class SemanticCache:
+    """Per-product cache matching questions by cosine similarity of their embeddings"""
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 ttl: float = SEMANTIC_CACHE_TTL, max_entries: int = SEMANTIC_CACHE_SIZE):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # product -> (N, dim) matrix of unit vectors, row-aligned with _entries[product]
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._entries: Dict[str, List[Tuple[Any, float]]] = {}
+
+    def check(self, product: str, embedding) -> Optional[Any]:
+        """Return the value stored for the most similar question, if close enough and not expired"""
+        vectors = self._vectors.get(product)
+        if vectors is None:
+            return None
+        scores = vectors @ _normalize(embedding)
+        # Expired rows can't match, so they don't hide a fresh row that would
+        now = time.monotonic()
+        entries = self._entries[product]
+        expired = np.fromiter((now - stored_at > self.ttl for _, stored_at in entries), dtype=bool, count=len(entries))
+        scores[expired] = -np.inf
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return entries[best][0]
+
+    def store(self, product: str, embedding, value: Any) -> None:
+        """Store a value for a question embedding, dropping expired and oldest entries"""
+        now = time.monotonic()
+        rows = [
+            (vector, entry)
+            for vector, entry in zip(self._vectors.get(product, ()), self._entries.get(product, ()))
+            if now - entry[1] <= self.ttl
+        ]
+        rows.append((_normalize(embedding), (value, now)))
+        rows = rows[-self.max_entries:]
+        self._vectors[product] = np.vstack([vector for vector, _ in rows])
+        self._entries[product] = [entry for _, entry in rows]
+
+# Create global instance
+semantic_cache = SemanticCache()
@@ -1,4 +1,4 @@
-from typing import List, Dict, Optional, Set
+from typing import Iterator, List, Dict, Optional, Set
 import logging
 import os
 from bs4 import BeautifulSoup
@@ -8,13 +8,101 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_chroma import Chroma
 from services.secret_store import retrieve_secret
+from services.product_registry import product_registry
 import hashlib
 from urllib.parse import urlparse, urljoin
 from datetime import datetime
 from collections import deque
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+# Limits for one embeddings API request when ingesting: OpenAI accepts up to 2048
+# inputs and 300k tokens; tokens are estimated as characters / 4
+EMBEDDING_BATCH_MAX_INPUTS = 2048
+EMBEDDING_BATCH_TOKEN_BUDGET = 100_000
+
+# Embedding requests in flight at once while ingesting
+EMBEDDING_CONCURRENCY = 4
+embedding_executor = ThreadPoolExecutor(max_workers=EMBEDDING_CONCURRENCY)
+
+def content_hash(text: str) -> str:
+    """Stable id for a chunk's content"""
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+def embedding_batches(chunks: List[Document]) -> Iterator[List[Document]]:
+    """Group chunks into requests filled up to the input and token limits"""
+    batch: List[Document] = []
+    batch_tokens = 0
+    for chunk in chunks:
+        tokens = len(chunk.page_content) // 4
+        if batch and (batch_tokens + tokens > EMBEDDING_BATCH_TOKEN_BUDGET
+                      or len(batch) >= EMBEDDING_BATCH_MAX_INPUTS):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(chunk)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+def add_chunks_to_vectorstores(chunks: List[Document], vectorstores: List[Chroma]) -> int:
+    """Embed chunks once, in requests packed by token budget, and add them to every given vectorstore.
+
+    Chunks are keyed by a hash of their content, so duplicates within the call and
+    chunks every store already holds are never embedded again. All vectorstores must
+    share the first one's embedding model. Returns the number of chunks embedded.
+    """
+    unique: Dict[str, Document] = {}
+    for chunk in chunks:
+        chunk_id = content_hash(chunk.page_content)
+        if chunk_id not in unique:
+            chunk.metadata["content_hash"] = chunk_id
+            unique[chunk_id] = chunk
+    if not unique:
+        return 0
+
+    # Only embed chunks that at least one of the stores is missing
+    missing = set()
+    for vectorstore in vectorstores:
+        existing = set(vectorstore._collection.get(ids=list(unique), include=[])["ids"])
+        missing.update(chunk_id for chunk_id in unique if chunk_id not in existing)
+    new_chunks = [chunk for chunk_id, chunk in unique.items() if chunk_id in missing]
+    if len(new_chunks) < len(chunks):
+        logger.info(f"Skipping {len(chunks) - len(new_chunks)} duplicate or already stored chunks")
+
+    # Embed batches concurrently; results come back in order and are written one at a time
+    embeddings = vectorstores[0].embeddings
+    batches = list(embedding_batches(new_chunks))
+    vector_batches = embedding_executor.map(
+        lambda batch: embeddings.embed_documents([chunk.page_content for chunk in batch]),
+        batches
+    )
+    for batch, vectors in zip(batches, vector_batches):
+        ids = [chunk.metadata["content_hash"] for chunk in batch]
+        texts = [chunk.page_content for chunk in batch]
+        metadatas = [chunk.metadata for chunk in batch]
+        for vectorstore in vectorstores:
+            vectorstore._collection.upsert(ids=ids, embeddings=vectors, metadatas=metadatas, documents=texts)
+    return len(new_chunks)
+
+@lru_cache(maxsize=4)
+def _openai_embeddings(api_key: str) -> OpenAIEmbeddings:
+    """Embeddings client, built once per API key"""
+    return OpenAIEmbeddings(
+        model="text-embedding-3-small",
+        openai_api_key=api_key
+    )
+
+@lru_cache(maxsize=64)
+def open_vectorstore(persist_directory: str, api_key: str) -> Chroma:
+    """Chroma store for a directory, opened once per API key and kept resident"""
+    return Chroma(
+        persist_directory=persist_directory,
+        embedding_function=_openai_embeddings(api_key)
+    )
+
 class URLDocStore:
     def __init__(self):
         self.chroma_dir = "chroma_db"
@@ -52,27 +140,38 @@ class URLDocStore:
             if not api_key:
                 logger.error("OpenAI API key not configured")
                 raise ValueError("OpenAI API key not configured")
-                
-            embeddings = OpenAIEmbeddings(
-                model="text-embedding-3-small",
-                openai_api_key=api_key
-            )
             
             product_dir = os.path.join(self.chroma_dir, product)
             os.makedirs(product_dir, exist_ok=True)
+            product_registry.register(product)
             
-            vectorstore = Chroma(
-                persist_directory=product_dir,
-                embedding_function=embeddings
-            )
-            
-            logger.info(f"Retrieved vectorstore for product {product}")
-            return vectorstore
+            return open_vectorstore(product_dir, api_key)
             
         except Exception as e:
             logger.error(f"Error getting vectorstore for product {product}: {e}")
             raise
 
+    def warm(self, products: List[str]) -> int:
+        """Open product stores and the embeddings connection ahead of the first ingest"""
+        try:
+            api_key = retrieve_secret("OPENAI_API_KEY")
+            if not api_key:
+                return 0
+            
+            opened = 0
+            for product in products:
+                product_dir = os.path.join(self.chroma_dir, product)
+                if os.path.isdir(product_dir):
+                    open_vectorstore(product_dir, api_key)
+                    opened += 1
+            
+            # One tiny request resolves DNS and sets up the TLS connection for later batches
+            _openai_embeddings(api_key).embed_query("warmup")
+            return opened
+        except Exception as e:
+            logger.error(f"Error warming URL vectorstores: {e}")
+            return 0
+
     def get_url_hash(self, url: str) -> str:
         """Generate a unique hash for a URL"""
         return hashlib.sha256(url.encode()).hexdigest()[:16]
@@ -341,11 +440,10 @@ class URLDocStore:
             vectorstore = self.get_vectorstore(product)
             
             # Add chunks to vectorstore
-            vectorstore.add_documents(chunks)
+            add_chunks_to_vectorstores(chunks, [vectorstore])
             
             # Also add to the central VectorStore used by QA
-            from services.vectorstore import VectorStore
-            qa_vectorstore = VectorStore()
+            from services.vectorstore import vector_store as qa_vectorstore
             
             # Ensure all chunks have the product metadata
             for chunk in chunks:
@@ -383,12 +481,11 @@ class URLDocStore:
                 if 'product' not in chunk.metadata:
                     chunk.metadata['product'] = product
             
-            # Add chunks to vectorstore in a single batch operation
-            vectorstore.add_documents(chunks)
+            # Add chunks to vectorstore in batched embedding calls
+            add_chunks_to_vectorstores(chunks, [vectorstore])
             
             # Also add to the central VectorStore used by QA
-            from services.vectorstore import VectorStore
-            qa_vectorstore = VectorStore()
+            from services.vectorstore import vector_store as qa_vectorstore
             
             # Add to the QA vectorstore in a single batch operation
             qa_vectorstore.add_documents(chunks, product)
@@ -529,10 +626,6 @@ class URLDocStore:
 
             # Get OpenAI API key for embeddings
             api_key = retrieve_secret("OPENAI_API_KEY")
-            embeddings = OpenAIEmbeddings(
-                model="text-embedding-3-small",
-                openai_api_key=api_key
-            )
             
             # Process each product group
             total_chunks = 0
@@ -545,11 +638,7 @@ class URLDocStore:
                 logger.info(f"Processing {len(documents)} documents for product {product}")
                 
                 # Split documents into chunks
-                text_splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=1000,
-                    chunk_overlap=200
-                )
-                chunks = text_splitter.split_documents(documents)
+                chunks = self.text_splitter.split_documents(documents)
                 
                 # Ensure all chunks have product information
                 for chunk in chunks:
@@ -557,23 +646,14 @@ class URLDocStore:
                         chunk.metadata["product"] = product
                 
                 # Store chunks in the main product directory
-                main_vectorstore = Chroma(
-                    persist_directory=os.path.join(self.chroma_dir, product),
-                    embedding_function=embeddings
-                )
+                main_vectorstore = open_vectorstore(os.path.join(self.chroma_dir, product), api_key)
                 
                 # Also store in the product_urls directory for backup/separate access
-                url_vectorstore = Chroma(
-                    persist_directory=os.path.join(self.chroma_dir, f"{product}_urls"),
-                    embedding_function=embeddings
-                )
+                url_vectorstore = open_vectorstore(os.path.join(self.chroma_dir, f"{product}_urls"), api_key)
 
-                # Add documents to both vector stores
-                logger.info(f"Adding {len(chunks)} URL chunks to main vectorstore for product '{product}'")
-                main_vectorstore.add_documents(chunks)
-                
-                logger.info(f"Adding {len(chunks)} URL chunks to URL-specific vectorstore")
-                url_vectorstore.add_documents(chunks)
+                # Embed once and add to both vector stores
+                logger.info(f"Adding {len(chunks)} URL chunks to main and URL-specific vectorstores for product '{product}'")
+                add_chunks_to_vectorstores(chunks, [main_vectorstore, url_vectorstore])
                 
                 total_chunks += len(chunks)
             
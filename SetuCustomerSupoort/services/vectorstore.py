@@ -1,15 +1,42 @@
 import os
 import hashlib
+from functools import lru_cache
+import numpy as np
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
 import config
 from services.secret_store import retrieve_secret
-from typing import List, Optional
+from typing import List, Optional, Dict, Iterable
 from langchain.docstore.document import Document
 import chromadb
+from chromadb import Collection
 from chromadb.config import Settings
+from chromadb.utils import embedding_functions
 from config import CHROMA_DIR
+from services.product_registry import product_registry
+
+# Number of query embeddings kept in memory; support questions repeat a lot
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+
+def maximal_marginal_relevance(query_embedding: np.ndarray, embeddings: np.ndarray,
+                               k: int, lambda_mult: float = 0.5) -> List[int]:
+    """Pick k row indices balancing similarity to the query against similarity to rows already picked"""
+    if len(embeddings) == 0:
+        return []
+    vectors = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    query = query_embedding / max(np.linalg.norm(query_embedding), 1e-12)
+    relevance = vectors @ query
+
+    selected = [int(np.argmax(relevance))]
+    redundancy = vectors @ vectors[selected[0]]
+    while len(selected) < min(k, len(vectors)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+    return selected
 
 # Dictionary to store document hashes for tracking changes
 document_hashes = {}
@@ -168,21 +195,77 @@ class VectorStore:
         self.client = chromadb.PersistentClient(
             path=str(CHROMA_DIR)
         )
+
+        # Same embedding function Chroma applies to query_texts, so cached
+        # vectors match what the collections were built with
+        self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        self._embed_query = lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)(self._compute_query_embedding)
+
+        # Open collection handles by product code, reused across searches
+        self._collections: Dict[str, Collection] = {}
+
+    def _compute_query_embedding(self, query: str) -> np.ndarray:
+        """Embed a single query; wrapped in an LRU cache by __init__"""
+        # Keep cached vectors as packed float32 rather than lists of Python floats
+        return np.asarray(self.embedding_function([query])[0], dtype=np.float32)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """Get the (cached) embedding Chroma searches with for a query"""
+        return self._embed_query(query)
+
+    def get_collection(self, product_code: str) -> Collection:
+        """Get a product collection, reusing the handle opened by an earlier call"""
+        collection = self._collections.get(product_code)
+        if collection is None:
+            collection = self.client.get_collection(
+                name=product_code,
+                embedding_function=self.embedding_function
+            )
+            self._collections[product_code] = collection
+        return collection
+
+    def warm(self, product_codes: Iterable[str]) -> int:
+        """Open collections and load their indexes ahead of the first search; returns how many opened"""
+        opened = 0
+        for product_code in product_codes:
+            try:
+                collection = self.get_collection(product_code)
+            except Exception:
+                # No collection for this product yet
+                continue
+            opened += 1
+            try:
+                # One query pages the HNSW index into memory and loads the embedding model
+                if collection.count() > 0:
+                    collection.query(
+                        query_embeddings=[self._embed_query("warmup").tolist()],
+                        n_results=1
+                    )
+            except Exception as e:
+                print(f"Error warming collection for product {product_code}: {e}")
+        return opened
         
     def add_documents(self, documents: List[Document], product_code: str):
-        collection = self.client.get_or_create_collection(name=product_code)
+        collection = self.client.get_or_create_collection(
+            name=product_code,
+            embedding_function=self.embedding_function
+        )
+        self._collections[product_code] = collection
         
-        # Extract text and metadata
-        texts = [doc.page_content for doc in documents]
-        metadatas = [doc.metadata for doc in documents]
-        ids = [str(i) for i in range(len(documents))]
+        # Key documents by content so re-ingesting the same text updates it in place;
+        # positional ids would collide with earlier batches and be dropped
+        unique = {
+            hashlib.blake2b(doc.page_content.encode(), digest_size=16).hexdigest(): doc
+            for doc in documents
+        }
         
-        # Add to collection
-        collection.add(
-            documents=texts,
-            metadatas=metadatas,
-            ids=ids
+        # Upsert into collection
+        collection.upsert(
+            documents=[doc.page_content for doc in unique.values()],
+            metadatas=[doc.metadata for doc in unique.values()],
+            ids=list(unique)
         )
+        product_registry.mark_updated(product_code)
         
     def search(self, query: str, product_code: str, k: int = 3) -> List[Document]:
         """
@@ -191,36 +274,70 @@ class VectorStore:
         """
         try:
             # Get collection for the specific product
-            collection = self.client.get_collection(name=product_code)
+            collection = self.get_collection(product_code)
             
-            # Query the specific product collection
+            # Query the specific product collection with the cached query embedding
             results = collection.query(
-                query_texts=[query],
+                query_embeddings=[self._embed_query(query).tolist()],
                 n_results=k
             )
             
-            # Convert results to Documents
-            documents = []
-            for i, text in enumerate(results['documents'][0]):
-                # Ensure metadata includes the product code
-                metadata = results['metadatas'][0][i] if i < len(results['metadatas'][0]) else {}
-                if 'product' not in metadata:
-                    metadata['product'] = product_code
-                    
-                doc = Document(
-                    page_content=text,
-                    metadata=metadata
-                )
-                documents.append(doc)
-                
-            return documents
+            return self._to_documents(results['documents'][0], results['metadatas'][0], product_code)
+        except Exception as e:
+            print(f"Error searching for documents in product {product_code}: {e}")
+            return []
+
+    def search_mmr(self, query: str, product_code: str, k: int = 5,
+                   fetch_k: int = 30, lambda_mult: float = 0.5) -> List[Document]:
+        """
+        Search a product collection with maximal marginal relevance: fetch the
+        fetch_k nearest chunks, then keep k that are relevant but not redundant.
+        """
+        try:
+            collection = self.get_collection(product_code)
+            query_embedding = self._embed_query(query)
+            results = collection.query(
+                query_embeddings=[query_embedding.tolist()],
+                n_results=fetch_k,
+                include=["documents", "metadatas", "embeddings"]
+            )
+            texts = results['documents'][0]
+            metadatas = results['metadatas'][0]
+
+            # Only chunks tagged with this product, or untagged, are eligible
+            eligible = [
+                i for i, metadata in enumerate(metadatas)
+                if (metadata or {}).get('product') in (product_code, "", None)
+            ]
+            if not eligible:
+                return []
+
+            candidates = np.asarray([results['embeddings'][0][i] for i in eligible], dtype=np.float32)
+            picked = [eligible[i] for i in maximal_marginal_relevance(query_embedding, candidates, k, lambda_mult)]
+            return self._to_documents([texts[i] for i in picked], [metadatas[i] for i in picked], product_code)
         except Exception as e:
             print(f"Error searching for documents in product {product_code}: {e}")
             return []
 
+    @staticmethod
+    def _to_documents(texts: List[str], metadatas: List[dict], product_code: str) -> List[Document]:
+        """Convert query results to Documents tagged with the product code"""
+        documents = []
+        for i, text in enumerate(texts):
+            # Ensure metadata includes the product code
+            metadata = (metadatas[i] if i < len(metadatas) else None) or {}
+            if 'product' not in metadata:
+                metadata['product'] = product_code
+
+            documents.append(Document(
+                page_content=text,
+                metadata=metadata
+            ))
+        return documents
+
     def get_collection_stats(self, product_code: str) -> dict:
         try:
-            collection = self.client.get_collection(name=product_code)
+            collection = self.get_collection(product_code)
             return {
                 "count": collection.count(),
                 "name": product_code
@@ -230,3 +347,6 @@ class VectorStore:
                 "count": 0,
                 "name": product_code
             }
+
+# Create global instance, shared so the process opens one Chroma client and embedding model
+vector_store = VectorStore()